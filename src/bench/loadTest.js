@@ -0,0 +1,277 @@
+import fs from "fs";
+import { execFile } from "child_process";
+import { performance } from "perf_hooks";
+
+/**
+ * Harness de carga do caminho Node → Python do dashboard.
+ *
+ * Sobe as rotas de /api/dashboard (sem MySQL) contra os JSONs locais, assina um
+ * token stub e dispara requisições concorrentes por endpoint. Reporta latência
+ * p50/p95/p99 e vazão só das respostas 2xx, taxa de erro à parte, pico de
+ * processos Python filhos e pico de RSS.
+ *
+ * --mode service chama getInsights() direto (mesmo caminho Node → Python, sem
+ * HTTP/express); só endpoints /insights/:period são suportados nesse modo.
+ *
+ * Por padrão o worker Python serve do cache de resultados (TTL 30s + janela
+ * "stale"), ou seja, mede acertos de cache. --cold sobe o worker com
+ * INSIGHTS_CACHE_TTL=0 e INSIGHTS_STALE_TTL=0: toda requisição gera o painel
+ * (grafo de métricas quente, como em produção). A configuração vai no relatório
+ * e a comparação com baseline avisa se ela diferir.
+ *
+ * Uso:
+ *   npm run loadtest -- --concurrency 20 --requests 100 --role admin \
+ *     --endpoints /insights/30d,/export --out bench.json --baseline bench_base.json
+ *   npm run loadtest -- --mode service --cold --endpoints /insights/30d
+ */
+
+// token stub: só precisa bater com o segredo usado pelo middleware
+process.env.JWT_SECRET = process.env.JWT_SECRET || "loadtest-secret";
+
+function parseArgs(argv) {
+  const opts = {
+    concurrency: 10,
+    requests: 50,
+    role: "admin",
+    endpoints: ["/insights/30d", "/export"],
+    mode: "http",
+    port: 0,
+    sampleMs: 50,
+    out: null,
+    baseline: null,
+    cold: false,
+  };
+  for (let i = 0; i < argv.length; i++) {
+    const key = argv[i].replace(/^--/, "");
+    const val = argv[i + 1];
+    if (key === "cold") {
+      opts.cold = true;
+      continue;
+    }
+    if (!(key in opts)) continue;
+    i++;
+    if (key === "endpoints") opts.endpoints = val.split(",").map((s) => s.trim()).filter(Boolean);
+    else if (["concurrency", "requests", "port", "sampleMs"].includes(key)) opts[key] = Number(val);
+    else opts[key] = val;
+  }
+  return opts;
+}
+
+async function startServer(port) {
+  // import tardio: as rotas leem JWT_SECRET/dotenv ao carregar
+  const { default: express } = await import("express");
+  const { default: dashboardRoutes } = await import("../routes/dashboardRoutes.js");
+  const { authenticateToken } = await import("../middlewares/authMiddleware.js");
+
+  const app = express();
+  app.use(express.json());
+  app.use("/api/dashboard", authenticateToken(), dashboardRoutes);
+
+  return new Promise((resolve) => {
+    const server = app.listen(port, () => resolve(server));
+  });
+}
+
+/* ========== Amostragem de processos Python (filhos deste processo) ========== */
+function samplePython() {
+  return new Promise((resolve) => {
+    execFile("ps", ["-eo", "pid=,ppid=,rss=,comm="], (err, stdout) => {
+      if (err) return resolve(null); // ps indisponível (ex.: Windows)
+      let count = 0;
+      let rssKb = 0;
+      for (const line of stdout.split("\n")) {
+        const [pid, ppid, rss, ...comm] = line.trim().split(/\s+/);
+        if (Number(ppid) === process.pid && /python/i.test(comm.join(" "))) {
+          count++;
+          rssKb += Number(rss) || 0;
+        }
+      }
+      resolve({ count, rssKb });
+    });
+  });
+}
+
+function startSampler(intervalMs) {
+  const peak = { count: 0, rssKb: 0, available: true };
+  let running = true;
+  const loop = (async () => {
+    while (running) {
+      const s = await samplePython();
+      if (!s) {
+        peak.available = false;
+        return;
+      }
+      peak.count = Math.max(peak.count, s.count);
+      peak.rssKb = Math.max(peak.rssKb, s.rssKb);
+      await new Promise((r) => setTimeout(r, intervalMs));
+    }
+  })();
+  return async () => {
+    running = false;
+    await loop;
+    return peak;
+  };
+}
+
+/* ========== Execução por endpoint ========== */
+function percentile(sorted, p) {
+  if (!sorted.length) return null;
+  const idx = Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1);
+  return Number(sorted[Math.max(idx, 0)].toFixed(1));
+}
+
+function isOk(code) {
+  return typeof code === "number" && code >= 200 && code < 300;
+}
+
+async function runEndpoint(request, endpoint, opts) {
+  const latencies = []; // só respostas 2xx
+  const status = {};
+  let total = 0;
+  let next = 0;
+
+  const stopSampler = startSampler(opts.sampleMs);
+  const t0 = performance.now();
+
+  const worker = async () => {
+    while (next < opts.requests) {
+      next++;
+      const start = performance.now();
+      let code = "erro";
+      try {
+        code = await request(endpoint);
+      } catch {
+        // falha de conexão: conta como erro
+      }
+      if (isOk(code)) latencies.push(performance.now() - start);
+      status[code] = (status[code] || 0) + 1;
+      total++;
+    }
+  };
+  await Promise.all(Array.from({ length: Math.max(opts.concurrency, 1) }, worker));
+
+  const elapsedS = (performance.now() - t0) / 1000;
+  const peak = await stopSampler();
+  latencies.sort((a, b) => a - b);
+
+  const erros = total - latencies.length;
+  if (total > 0 && erros === total) {
+    console.warn(`⚠️ ${endpoint}: 100% das requisições falharam (${JSON.stringify(status)}); latências não reportadas`);
+  }
+
+  return {
+    endpoint,
+    requisicoes: total,
+    concorrencia: opts.concurrency,
+    status,
+    taxa_erro: total ? Number((erros / total).toFixed(4)) : null,
+    p50_ms: percentile(latencies, 50),
+    p95_ms: percentile(latencies, 95),
+    p99_ms: percentile(latencies, 99),
+    vazao_rps: Number((latencies.length / elapsedS).toFixed(2)),
+    pico_python: peak.available ? peak.count : null,
+    pico_rss_mb: peak.available ? Number((peak.rssKb / 1024).toFixed(1)) : null,
+  };
+}
+
+/* ========== Cache de resultados do worker Python ========== */
+function configureCache(opts) {
+  // precisa valer antes do primeiro getInsights: o worker herda process.env ao subir
+  if (opts.cold) {
+    process.env.INSIGHTS_CACHE_TTL = "0";
+    process.env.INSIGHTS_STALE_TTL = "0";
+  }
+  return {
+    frio: opts.cold,
+    INSIGHTS_CACHE_TTL: Number(process.env.INSIGHTS_CACHE_TTL ?? 30),
+    INSIGHTS_STALE_TTL: Number(process.env.INSIGHTS_STALE_TTL ?? 300),
+  };
+}
+
+function compareWithBaseline(results, baselinePath, cache) {
+  let base;
+  try {
+    base = JSON.parse(fs.readFileSync(baselinePath, "utf-8"));
+  } catch (err) {
+    console.warn(`⚠️ Baseline ilegível (${baselinePath}):`, err.message);
+    return;
+  }
+  if (JSON.stringify(base.cache) !== JSON.stringify(cache)) {
+    console.warn(`⚠️ Cache diferente da baseline (atual ${JSON.stringify(cache)}, baseline ${JSON.stringify(base.cache ?? "não registrado")}): comparação não é equivalente`);
+  }
+  const byEndpoint = Object.fromEntries((base.resultados || []).map((r) => [r.endpoint, r]));
+  const delta = (a, b) => (a == null || b == null || b === 0 ? "—" : `${(((a - b) / b) * 100).toFixed(1)}%`);
+
+  console.log("\n📊 Comparação com baseline:");
+  console.table(
+    results.map((r) => {
+      const b = byEndpoint[r.endpoint] || {};
+      return {
+        endpoint: r.endpoint,
+        "Δ p50": delta(r.p50_ms, b.p50_ms),
+        "Δ p95": delta(r.p95_ms, b.p95_ms),
+        "Δ p99": delta(r.p99_ms, b.p99_ms),
+        "taxa erro": `${r.taxa_erro} (base ${b.taxa_erro ?? "—"})`,
+        "Δ vazão": delta(r.vazao_rps, b.vazao_rps),
+        "Δ pico RSS": delta(r.pico_rss_mb, b.pico_rss_mb),
+      };
+    })
+  );
+}
+
+/* ========== Alvos: HTTP (rotas reais) ou serviço direto ========== */
+async function httpTarget(opts) {
+  const { default: jwt } = await import("jsonwebtoken");
+  const server = await startServer(opts.port);
+  const baseUrl = `http://127.0.0.1:${server.address().port}/api/dashboard`;
+  const token = jwt.sign({ id: 0, role: opts.role }, process.env.JWT_SECRET, { expiresIn: "1h" });
+  const request = async (endpoint) => {
+    const res = await fetch(`${baseUrl}${endpoint}`, { headers: { Authorization: `Bearer ${token}` } });
+    await res.arrayBuffer();
+    return res.status;
+  };
+  return { request, close: () => server.close() };
+}
+
+function serviceTarget(getInsights, opts) {
+  const request = async (endpoint) => {
+    const m = endpoint.match(/^\/insights\/([^/?]+)$/);
+    if (!m) return 404; // sem rota equivalente fora do HTTP
+    await getInsights(m[1], opts.role);
+    return 200;
+  };
+  return { request, close: () => {} };
+}
+
+async function main() {
+  const opts = parseArgs(process.argv.slice(2));
+  const cache = configureCache(opts);
+  const { getInsights, stopInsightsWorker } = await import("../services/dashboardService.js");
+  const target = opts.mode === "service" ? serviceTarget(getInsights, opts) : await httpTarget(opts);
+
+  console.log(`🚦 Carga (${opts.mode}): ${opts.requests} req × ${opts.concurrency} concorrentes por endpoint (role=${opts.role}, cache ${cache.frio ? "desligado" : `TTL ${cache.INSIGHTS_CACHE_TTL}s`})`);
+
+  const results = [];
+  for (const endpoint of opts.endpoints) {
+    console.log(`→ ${endpoint}`);
+    results.push(await runEndpoint(target.request, endpoint, opts));
+  }
+  target.close();
+  stopInsightsWorker();
+
+  console.table(
+    results.map(({ status, ...r }) => ({ ...r, status: JSON.stringify(status) }))
+  );
+
+  const report = { data: new Date().toISOString(), opcoes: opts, cache, resultados: results };
+  if (opts.out) {
+    fs.writeFileSync(opts.out, JSON.stringify(report, null, 2));
+    console.log(`✅ Resultado salvo em ${opts.out}`);
+  }
+  if (opts.baseline) compareWithBaseline(results, opts.baseline, cache);
+}
+
+main().catch((err) => {
+  console.error("❌ Falha no teste de carga:", err);
+  process.exit(1);
+});
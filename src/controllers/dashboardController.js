@@ -1,4 +1,4 @@
-import { getInsights } from "../services/dashboardService.js";
+import { getInsights, PERIODS } from "../services/dashboardService.js";
 import { generateExport } from "../services/exportService.js";
 import { runPythonScript } from "../utils/pythonRunner.js";
 import path from "path";
@@ -6,6 +6,8 @@ import path from "path";
 export async function handleInsights(req, res) {
   try {
     const { period } = req.params;
+    if (!PERIODS.includes(period))
+      return res.status(400).json({ error: `Período inválido. Use: ${PERIODS.join(", ")}` });
     const { metric, channel, region } = req.query;
     const userRole = req.user?.role || "admin";
 
@@ -0,0 +1,114 @@
+from itertools import combinations
+import pandas as pd
+from core.data_loader import as_numeric
+
+# ========= Cubo de desempenho de campanhas =========
+# dimensão lógica -> colunas aceitas (a primeira existente é usada)
+DIMENSOES = {
+    "saleschannel": ("saleschannel", "salesChannel"),
+    "hour": ("hour",),
+    "type": ("type",),
+    "store": ("store.name", "storeId", "storeid"),
+}
+METRICA = "conversionRate"
+
+def _chave(valor):
+    # NaN != NaN: valores ausentes viram None para que as buscas por célula funcionem
+    return None if pd.isna(valor) else valor
+
+class CampaignCube:
+    """
+    Agrega `conversionRate` uma única vez sobre canal × hora × tipo × loja e
+    pré-calcula todos os rollups e rankings. Consultas de top-k e de
+    slice/dice viram apenas buscas em dicionário.
+    Valores ausentes de uma dimensão entram nos rollups das demais (como None),
+    mas nunca concorrem no ranking da própria dimensão.
+    Dimensões desconhecidas resultam em slice vazio ([] / None).
+    """
+
+    def __init__(self, campaigns: pd.DataFrame, metric: str = METRICA):
+        self.dims: tuple[str, ...] = ()
+        self._cells: dict = {}  # dims (tupla) -> {valores (tupla): (media, n)}
+        self._rank: dict = {}   # (filtros (tupla), by) -> {valores dos filtros: [linhas ordenadas]}
+        if campaigns is None or campaigns.empty or metric not in campaigns.columns:
+            return
+
+        cols = {}
+        for dim, candidatas in DIMENSOES.items():
+            for c in candidatas:
+                if c in campaigns.columns:
+                    cols[dim] = c
+                    break
+        if not cols:
+            return
+        self.dims = tuple(cols)
+
+        # passada única: cuboid base com soma e contagem
+        base = pd.DataFrame({d: campaigns[c] for d, c in cols.items()})
+        base["_v"] = as_numeric(campaigns, metric)
+        base = (base.dropna(subset=["_v"])
+                    .groupby(list(self.dims), dropna=False)["_v"]
+                    .agg(soma="sum", n="count")
+                    .reset_index())
+
+        # rollups de todos os subconjuntos de dimensões (derivados do cuboid base)
+        cuboids = {}
+        for r in range(len(self.dims) + 1):
+            for sub in combinations(self.dims, r):
+                if sub:
+                    g = base.groupby(list(sub), sort=False, dropna=False)[["soma", "n"]].sum().reset_index()
+                else:
+                    g = pd.DataFrame({"soma": [base["soma"].sum()], "n": [base["n"].sum()]})
+                g["media"] = g["soma"] / g["n"]
+                cuboids[sub] = g
+                self._cells[sub] = {
+                    tuple(_chave(v) for v in row[:-3]): (float(row[-1]), int(row[-2]))
+                    for row in g[list(sub) + ["soma", "n", "media"]].itertuples(index=False, name=None)
+                }
+
+        # rankings por dimensão livre dentro de cada slice
+        for sub, g in cuboids.items():
+            for by in sub:
+                filtros = tuple(d for d in sub if d != by)
+                ordenado = (g[g[by].notna()]
+                            .sort_values(["media", "n"], ascending=[False, False], kind="mergesort"))
+                tabela: dict = {}
+                for row in ordenado[list(sub) + ["media", "n"]].itertuples(index=False, name=None):
+                    valores = {d: _chave(v) for d, v in zip(sub, row[:-2])}
+                    chave = tuple(valores[f] for f in filtros)
+                    tabela.setdefault(chave, []).append(
+                        {by: valores[by], "taxa": float(row[-2]), "campanhas": int(row[-1])}
+                    )
+                self._rank[(filtros, by)] = tabela
+
+    def _key(self, filtros: dict) -> tuple | None:
+        if not set(filtros) <= set(self.dims):
+            return None
+        return tuple(d for d in self.dims if d in filtros)
+
+    def top(self, by: str, k: int = 1, **filtros) -> list[dict]:
+        """Top-k valores de `by` por taxa média, dentro do slice definido por `filtros`."""
+        dims = self._key(filtros)
+        if by not in self.dims or dims is None:
+            return []
+        tabela = self._rank.get((dims, by), {})
+        return tabela.get(tuple(filtros[d] for d in dims), [])[:k]
+
+    def value(self, **coords) -> tuple[float, int] | None:
+        """(taxa média, nº de campanhas) da célula `coords`; rollup total se vazio."""
+        dims = self._key(coords)
+        if dims is None:
+            return None
+        return self._cells.get(dims, {}).get(tuple(coords[d] for d in dims))
+
+def campaign_cube(campaigns) -> CampaignCube:
+    """
+    Cubo de `campaigns` (DataFrame); um CampaignCube é devolvido como está.
+    Quem consulta repetidamente deve guardar o cubo (o painel cliente o mantém
+    como nó do grafo de métricas, recalculado só quando o arquivo muda).
+    """
+    if isinstance(campaigns, CampaignCube):
+        return campaigns
+    if campaigns is None or campaigns.empty:
+        return CampaignCube(pd.DataFrame())
+    return CampaignCube(campaigns)
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+# ========= Single-flight + stale-while-revalidate =========
+
+def env_seconds(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class CoalescingCache:
+    """
+    Envolve uma função cara (ex.: geração de insights) por chave de argumentos.
+
+    - resultado com idade <= ttl: servido direto (hit);
+    - idade <= ttl + stale_ttl: servido "velho" enquanto UMA atualização roda em background;
+    - sem resultado utilizável: chamadas concorrentes idênticas compartilham um único cálculo.
+
+    O valor retornado é compartilhado entre os chamadores; não o modifique.
+    """
+
+    def __init__(self, fn, ttl: float = 30.0, stale_ttl: float = 300.0, clock=time.monotonic):
+        self.fn = fn
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: dict = {}   # chave -> (valor, instante)
+        self._inflight: dict = {}  # chave -> _Call
+        self._stats = {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "errors": 0}
+
+    def get(self, *args):
+        key = args
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry[1]
+                if age <= self.ttl:
+                    self._stats["hits"] += 1
+                    return entry[0]
+                if age <= self.ttl + self.stale_ttl:
+                    self._stats["stale"] += 1
+                    if key not in self._inflight:
+                        call = self._inflight[key] = _Call()
+                        self._stats["refreshes"] += 1
+                        threading.Thread(target=self._run, args=(key, call), daemon=True).start()
+                    return entry[0]
+
+            call = self._inflight.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                self._stats["misses"] += 1
+                call = self._inflight[key] = _Call()
+                leader = True
+
+        if leader:
+            self._run(key, call)
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def _run(self, key, call: _Call):
+        try:
+            call.value = self.fn(*key)
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                if call.error is None:
+                    self._entries[key] = (call.value, self._clock())
+                else:
+                    self._stats["errors"] += 1
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    def invalidate(self, *args):
+        """Descarta o resultado de uma chave (ou de todas, sem argumentos)."""
+        with self._lock:
+            if args:
+                self._entries.pop(args, None)
+            else:
+                self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entradas": len(self._entries), "em_andamento": len(self._inflight)}
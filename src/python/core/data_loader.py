@@ -29,27 +29,201 @@ def read_text_json(filename: str):
     except Exception:
         return None
 
+# ========= Ingestão canônica =========
+# Cada schema descreve, para um dataset, o que é feito UMA vez no carregamento:
+# renomear colunas, converter numéricos/datas e normalizar categorias
+# (ausentes viram "fill", "Desconhecido" por padrão; fill=None mantém NaN).
+# Os frames resultantes ficam marcados em `df.attrs` e os helpers abaixo
+# pulam a conversão quando a coluna já é canônica.
+
+SCHEMAS = {
+    "order_api": {
+        "rename": {},
+        "numeric": ["total.orderamount", "total.deliveryfee", "preparationtime"],
+        "datetime": ["createdat", "updatedat", "preparationstartdatetime", "deliverydatetime"],
+        "category": ["saleschannel"],
+        "required": ["id", "store.name", "saleschannel", "total.orderamount"],
+    },
+    "customer_api": {
+        "rename": {},
+        "numeric": [],
+        "datetime": ["createdat", "updatedat"],
+        "category": [],
+        "required": ["id"],
+    },
+    "campaign_api": {
+        "rename": {},
+        "numeric": [],
+        "datetime": ["createdat", "updatedat"],
+        "category": [],
+        "required": ["id", "name"],
+    },
+    "campaignqueue_api": {
+        "rename": {},
+        "numeric": [],
+        "datetime": ["createdat", "scheduledat", "sendat"],
+        "category": [],
+        "required": ["campaignid", "response"],
+    },
+    "orders": {
+        "rename": {"salesChannel": "saleschannel"},
+        "numeric": ["total.orderAmount", "total.deliveryFee", "delivery.preparationTime"],
+        "datetime": ["createdAt", "updatedAt", "preparationStartDateTime"],
+        "category": ["saleschannel"],
+        "required": ["id", "customer.id", "total.orderAmount", "createdAt"],
+    },
+    "customers": {
+        "rename": {},
+        "numeric": ["totalOrders", "avgTicket", "totalSpent"],
+        "datetime": ["lastOrder"],
+        "category": [],
+        "required": ["id", "lastOrder"],
+    },
+    "campaigns": {
+        "rename": {"salesChannel": "saleschannel"},
+        "numeric": ["conversionRate"],
+        "datetime": [],
+        "category": ["saleschannel"],
+        # canal ausente não é um canal: fica NaN para não concorrer a canal_ideal
+        "fill": None,
+        "required": ["id", "name"],
+    },
+}
+
+_INGEST_STATS = {"datasets": {}, "conversoes_evitadas": {}}
+
+def _note_saved(kind: str, col: str):
+    key = f"{kind}:{col}"
+    saved = _INGEST_STATS["conversoes_evitadas"]
+    saved[key] = saved.get(key, 0) + 1
+
+def is_canonical(df: pd.DataFrame, col: str | None = None) -> bool:
+    """True se o frame passou por `canonicalize` (e, se informado, se `col` foi convertida lá)."""
+    if not isinstance(df, pd.DataFrame) or not df.attrs.get("canonical"):
+        return False
+    return col is None or col in df.attrs.get("coerced", ())
+
+def canonicalize(df: pd.DataFrame, schema: str, source: str | None = None) -> pd.DataFrame:
+    """Renomeia, converte e valida o frame segundo SCHEMAS[schema]; marca-o como canônico."""
+    spec = SCHEMAS[schema]
+    report = {"linhas": int(len(df)), "renomeadas": [], "convertidas": [], "invalidos": {}, "ausentes": []}
+
+    renames = {k: v for k, v in spec["rename"].items() if k in df.columns and v not in df.columns}
+    if renames:
+        df = df.rename(columns=renames)
+        report["renomeadas"] = [f"{k}->{v}" for k, v in renames.items()]
+
+    coerced = []
+    for c in spec["numeric"]:
+        if c in df.columns:
+            raw = df[c]
+            df[c] = pd.to_numeric(raw, errors="coerce")
+            bad = int((df[c].isna() & raw.notna()).sum())
+            if bad:
+                report["invalidos"][c] = bad
+            coerced.append(c)
+    for c in spec["datetime"]:
+        if c in df.columns:
+            raw = df[c]
+            df[c] = pd.to_datetime(raw, errors="coerce", utc=True)
+            bad = int((df[c].isna() & raw.notna() & raw.astype(str).str.strip().ne("")).sum())
+            if bad:
+                report["invalidos"][c] = bad
+            coerced.append(c)
+    fill = spec.get("fill", "Desconhecido")
+    for c in spec["category"]:
+        if c in df.columns:
+            if fill is None:
+                df[c] = df[c].where(df[c].isna(), df[c].astype(str).str.strip())
+            else:
+                df[c] = df[c].fillna(fill).astype(str).str.strip()
+            coerced.append(c)
+
+    report["convertidas"] = coerced
+    report["ausentes"] = [c for c in spec["required"] if c not in df.columns]
+    report["schema"] = schema
+    _INGEST_STATS["datasets"][source or schema] = report
+
+    df.attrs["canonical"] = schema
+    df.attrs["coerced"] = tuple(coerced)
+    return df
+
+def ingest_report() -> dict:
+    """Resumo da ingestão: o que foi convertido/validado e quantas reconversões foram evitadas."""
+    saved = dict(_INGEST_STATS["conversoes_evitadas"])
+    return {
+        "datasets": {k: dict(v) for k, v in _INGEST_STATS["datasets"].items()},
+        "conversoes_evitadas": saved,
+        "total_evitadas": int(sum(saved.values())),
+    }
+
+def as_numeric(df: pd.DataFrame, col: str) -> pd.Series:
+    """Coluna numérica; não reconverte se o frame já é canônico."""
+    if is_canonical(df, col):
+        _note_saved("to_numeric", col)
+        return df[col]
+    return pd.to_numeric(df[col], errors="coerce")
+
+def as_datetime(df: pd.DataFrame, col: str) -> pd.Series:
+    """Coluna datetime (UTC); não reconverte se o frame já é canônico."""
+    if is_canonical(df, col):
+        _note_saved("to_datetime", col)
+        return df[col]
+    return pd.to_datetime(df[col], errors="coerce", utc=True)
+
 def to_numeric(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
     for c in cols:
-        if c in df.columns:
+        if c not in df.columns:
+            continue
+        if is_canonical(df, c):
+            _note_saved("to_numeric", c)
+        else:
             df[c] = pd.to_numeric(df[c], errors="coerce")
     return df
 
+def to_datetime(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    for c in cols:
+        if c not in df.columns:
+            continue
+        if is_canonical(df, c):
+            _note_saved("to_datetime", c)
+        else:
+            df[c] = pd.to_datetime(df[c], errors="coerce", utc=True)
+    return df
+
 def lower_strip_columns(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = df.columns.str.lower().str.strip()
     return df
 
+def load_table(filename: str, schema: str, lower: bool = False) -> pd.DataFrame:
+    """Carrega um JSON de data/ já canônico (uma entrada do ingest)."""
+    df = read_json_df(filename)
+    if lower:
+        df = lower_strip_columns(df)
+    return canonicalize(df, schema, filename)
+
 # loaders “API_ready”
+API_READY = {
+    "campaign": ("Campaign_API_ready.json", "campaign_api"),
+    "cq":       ("CampaignQueue_API_ready.json", "campaignqueue_api"),
+    "customer": ("Customer_API_ready.json", "customer_api"),
+    "order":    ("Order_API_ready.json", "order_api"),
+}
+
+def load_api_ready_file(name: str) -> pd.DataFrame:
+    filename, schema = API_READY[name]
+    return load_table(filename, schema, lower=True)
+
 def load_api_ready():
-    campaign = lower_strip_columns(read_json_df("Campaign_API_ready.json"))
-    cq       = lower_strip_columns(read_json_df("CampaignQueue_API_ready.json"))
-    customer = lower_strip_columns(read_json_df("Customer_API_ready.json"))
-    order    = lower_strip_columns(read_json_df("Order_API_ready.json"))
+    campaign = load_api_ready_file("campaign")
+    cq       = load_api_ready_file("cq")
+    customer = load_api_ready_file("customer")
+    order    = load_api_ready_file("order")
     return campaign, cq, customer, order
 
 # loaders por período (30d/60d/90d)
 def load_period(period: str):
-    orders    = read_json_df(f"orders_{period}.json")
-    customers = read_json_df(f"customers_{period}.json")
-    campaigns = read_json_df("campaigns.json")
+    orders    = load_table(f"orders_{period}.json", "orders")
+    customers = load_table(f"customers_{period}.json", "customers")
+    campaigns = load_table("campaigns.json", "campaigns")
     return orders, customers, campaigns
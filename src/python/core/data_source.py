@@ -0,0 +1,283 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+from core.data_loader import API_READY, BASE_DATA_DIR, load_api_ready, canonicalize
+from core.metrics import (
+    normalize_saleschannel, admin_summary, kpis_by_store, kpis_by_channel,
+    log_summary, log_kpis_by_store, log_kpis_by_channel,
+)
+from core.order_log import OrderLog
+
+# ========= Fontes de dados plugáveis =========
+# Interface mínima usada pelo painel admin:
+#   table(name, columns)          -> DataFrame canônico ("order", "customer", "campaign", "cq")
+#   admin_summary(start, end)     -> dict
+#   kpis_by_store(start, end, limit), kpis_by_channel(start, end) -> DataFrame
+# Datas `start`/`end` filtram `createdat` (início inclusivo, fim exclusivo).
+
+TABLES = {
+    "campaign": ("campaigns", "campaign_api"),
+    "cq": ("campaign_queue", "campaignqueue_api"),
+    "customer": ("customers", "customer_api"),
+    "order": ("orders", "order_api"),
+}
+
+STORE_COLS = ["store.name", "saleschannel", "pedidos", "receita", "ticket_medio", "tempo_medio"]
+CHANNEL_COLS = ["saleschannel", "pedidos", "receita", "ticket_medio", "tempo_medio"]
+
+def _sql_name(col: str) -> str:
+    return col.replace(".", "__")
+
+def _df_name(col: str) -> str:
+    return col.replace("__", ".")
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tz is None else ts.tz_convert("UTC")
+
+def _iso(ts) -> str:
+    return _utc(ts).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+class JsonDataSource:
+    """
+    Fonte atual: JSONs de data/ carregados em memória; agregações via core.metrics.
+    Recarrega quando algum dos arquivos muda (mtime/tamanho).
+    `frames` fixa as tabelas em memória (testes, dados sintéticos) e desliga a recarga.
+    """
+
+    def __init__(self, frames: dict | None = None):
+        self._frames = frames
+        self._stamps = None
+        self._fixed = frames is not None
+
+    def _file_stamps(self) -> tuple:
+        stamps = []
+        for filename, _ in API_READY.values():
+            try:
+                st = os.stat(os.path.join(BASE_DATA_DIR, filename))
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _load(self) -> dict:
+        if self._fixed:
+            return self._frames
+        stamps = self._file_stamps()
+        if self._frames is None or stamps != self._stamps:
+            self._stamps = stamps
+            campaign, cq, customer, order = load_api_ready()
+            self._frames = {"campaign": campaign, "cq": cq, "customer": customer,
+                            "order": normalize_saleschannel(order)}
+        return self._frames
+
+    def table(self, name: str, columns: list[str] | None = None) -> pd.DataFrame:
+        df = self._load()[name]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    def _orders(self, start=None, end=None) -> pd.DataFrame:
+        order = self._load()["order"]
+        if (start is None and end is None) or "createdat" not in order.columns:
+            return order
+        mask = pd.Series(True, index=order.index)
+        if start is not None:
+            mask &= order["createdat"] >= _utc(start)
+        if end is not None:
+            mask &= order["createdat"] < _utc(end)
+        return order[mask]
+
+    def admin_summary(self, start=None, end=None) -> dict:
+        return admin_summary(self._orders(start, end), self._load()["customer"])
+
+    def kpis_by_store(self, start=None, end=None, limit: int | None = None) -> pd.DataFrame:
+        g = kpis_by_store(self._orders(start, end))
+        return g.head(limit) if limit else g
+
+    def kpis_by_channel(self, start=None, end=None) -> pd.DataFrame:
+        return kpis_by_channel(self._orders(start, end))
+
+class SQLDataSource:
+    """
+    Fonte SQL sobre uma conexão DB-API (sqlite3 nos testes/benchmarks; MySQL com
+    placeholder="%s"). GROUP BYs e filtros de data rodam no banco; só linhas
+    agregadas ou colunas projetadas voltam, lidas em lotes via fetchmany.
+    """
+
+    def __init__(self, conn, placeholder: str = "?", batch_size: int = 5000):
+        self.conn = conn
+        self.ph = placeholder
+        self.batch_size = batch_size
+        self._lock = threading.Lock()  # a conexão é compartilhada entre threads
+
+    def close(self):
+        self.conn.close()
+
+    def _query(self, sql: str, params=(), columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Executa `sql` e monta o DataFrame lote a lote (fetchmany): cada lote de
+        tuplas vira colunas antes do próximo, então só um lote de objetos Python
+        fica em memória por vez.
+        """
+        with self._lock:
+            cur = self.conn.cursor()
+            try:
+                cur.execute(sql, params)
+                cols = columns or [_df_name(d[0]) for d in cur.description]
+                frames = []
+                while True:
+                    batch = cur.fetchmany(self.batch_size)
+                    if not batch:
+                        break
+                    frames.append(pd.DataFrame.from_records(batch, columns=cols))
+            finally:
+                cur.close()
+        if not frames:
+            return pd.DataFrame(columns=cols)
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def _where(self, start=None, end=None) -> tuple[str, list]:
+        conds, params = [], []
+        if start is not None:
+            conds.append(f"createdat >= {self.ph}")
+            params.append(_iso(start))
+        if end is not None:
+            conds.append(f"createdat < {self.ph}")
+            params.append(_iso(end))
+        return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+    def table(self, name: str, columns: list[str] | None = None) -> pd.DataFrame:
+        tabela, schema = TABLES[name]
+        proj = ", ".join(_sql_name(c) for c in columns) if columns else "*"
+        return canonicalize(self._query(f"SELECT {proj} FROM {tabela}"), schema, f"sql:{tabela}")
+
+    def admin_summary(self, start=None, end=None) -> dict:
+        where, params = self._where(start, end)
+        row = self._query(
+            "SELECT COUNT(*), AVG(total__orderamount), AVG(preparationtime), "
+            f"(SELECT COUNT(*) FROM customers) FROM orders{where}", params,
+            ["pedidos", "ticket", "preparo", "clientes"]).iloc[0]
+        pedidos, ticket, preparo, clientes = (None if pd.isna(v) else v for v in row)
+        if not pedidos or not clientes:
+            return {"ticket_medio_geral": 0.0, "tempo_medio_preparo": 0.0, "total_pedidos": 0, "total_clientes": 0}
+        return {
+            "ticket_medio_geral": round(float(ticket), 2) if ticket is not None else float("nan"),
+            "tempo_medio_preparo": round(float(preparo), 2) if preparo is not None else float("nan"),
+            "total_pedidos": int(pedidos),
+            "total_clientes": int(clientes),
+        }
+
+    def _kpis(self, keys: list[str], out_cols: list[str], order_by: str,
+              start=None, end=None, limit=None) -> pd.DataFrame:
+        where, params = self._where(start, end)
+        sel = ", ".join(keys)
+        sql = (
+            f"SELECT {sel}, COUNT(id) AS pedidos, SUM(total__orderamount) AS receita, "
+            "AVG(total__orderamount) AS ticket_medio, AVG(preparationtime) AS tempo_medio "
+            f"FROM orders{where} GROUP BY {sel} "
+            f"ORDER BY {order_by}"
+        )
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        g = self._query(sql, params, out_cols)
+        for c in ["receita", "ticket_medio", "tempo_medio"]:
+            g[c] = pd.to_numeric(g[c], errors="coerce").round(2)
+        return g
+
+    def kpis_by_store(self, start=None, end=None, limit: int | None = None) -> pd.DataFrame:
+        keys = ["store__name", "saleschannel"]
+        return self._kpis(keys, STORE_COLS, "receita IS NULL, receita DESC, store__name, saleschannel",
+                          start, end, limit)
+
+    def kpis_by_channel(self, start=None, end=None) -> pd.DataFrame:
+        # mesma ordem do pandas (chave do grupo)
+        return self._kpis(["saleschannel"], CHANNEL_COLS, "saleschannel", start, end)
+
+class OrderLogDataSource:
+    """
+    Pedidos lidos do log binário (memmap, zero-cópia); demais tabelas vêm de `fallback`.
+    Os registros são lidos ANTES dos dicionários: o escritor grava o dicionário
+    primeiro, então todo código do snapshot já está no dicionário lido depois.
+    """
+
+    def __init__(self, log: OrderLog, fallback=None):
+        self.log = log
+        self.fallback = fallback or JsonDataSource()
+
+    def table(self, name: str, columns: list[str] | None = None) -> pd.DataFrame:
+        return self.fallback.table(name, columns)
+
+    def admin_summary(self, start=None, end=None) -> dict:
+        resumo = log_summary(self.log.records(), start, end)
+        clientes = len(self.fallback.table("customer"))
+        if resumo["total_pedidos"] == 0 or clientes == 0:
+            return {"ticket_medio_geral": 0.0, "tempo_medio_preparo": 0.0, "total_pedidos": 0, "total_clientes": 0}
+        return {**resumo, "total_clientes": int(clientes)}
+
+    def kpis_by_store(self, start=None, end=None, limit: int | None = None) -> pd.DataFrame:
+        rec = self.log.records()
+        dicts = self.log.dictionaries()
+        g = log_kpis_by_store(rec, dicts["store"], dicts["channel"], start, end)
+        return g.head(limit) if limit else g
+
+    def kpis_by_channel(self, start=None, end=None) -> pd.DataFrame:
+        rec = self.log.records()
+        return log_kpis_by_channel(rec, self.log.dictionaries()["channel"], start, end)
+
+def load_sqlite(path: str = ":memory:", source: JsonDataSource | None = None) -> SQLDataSource:
+    """Cria um banco SQLite a partir dos JSONs de data/ (stand-in local do MySQL)."""
+    source = source or JsonDataSource()
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for name, (tabela, _) in TABLES.items():
+        df = source.table(name).copy()
+        for c in df.columns:
+            if isinstance(df[c].dtype, pd.DatetimeTZDtype):
+                df[c] = df[c].dt.tz_convert("UTC").dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+            elif df[c].dtype == object:
+                df[c] = df[c].map(lambda v: v if v is None or isinstance(v, (str, int, float, bool)) else str(v))
+        df.columns = [_sql_name(c) for c in df.columns]
+        df.to_sql(tabela, conn, if_exists="replace", index=False)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_orders_createdat ON orders (createdat)")
+    conn.commit()
+    return SQLDataSource(conn)
+
+_SOURCES: dict = {}  # (tipo, caminho) -> (identidade do arquivo, fonte)
+_SOURCES_LOCK = threading.Lock()
+
+def _file_id(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_dev, st.st_ino)
+    except OSError:
+        return None
+
+def _cached_source(kind: str, path: str, ident_path: str, factory):
+    # uma fonte (e uma conexão) por caminho; reaberta só se o arquivo for substituído
+    ident = _file_id(ident_path)
+    with _SOURCES_LOCK:
+        cached = _SOURCES.get((kind, path))
+        if cached is not None and cached[0] == ident:
+            return cached[1]
+        if cached is not None and hasattr(cached[1], "close"):
+            cached[1].close()
+        source = factory()
+        _SOURCES[(kind, path)] = (ident, source)
+        return source
+
+def get_source():
+    """
+    Fonte padrão: SQLite em ANALYTICS_SQLITE_PATH, ou log binário em
+    ANALYTICS_ORDER_LOG (caminho sem extensão), se definidos; senão os JSONs de data/.
+    Fontes SQLite e de log são reaproveitadas por caminho entre chamadas.
+    """
+    path = os.environ.get("ANALYTICS_SQLITE_PATH")
+    if path and os.path.exists(path):
+        return _cached_source("sqlite", path, path,
+                              lambda: SQLDataSource(sqlite3.connect(path, check_same_thread=False)))
+    log_path = os.environ.get("ANALYTICS_ORDER_LOG")
+    if log_path and os.path.exists(f"{log_path}.bin"):
+        return _cached_source("log", log_path, f"{log_path}.bin",
+                              lambda: OrderLogDataSource(OrderLog(log_path)))
+    return JsonDataSource()
@@ -0,0 +1,180 @@
+import os
+import threading
+import pandas as pd
+
+# ========= Grafo de métricas com recomputação seletiva =========
+# Três tipos de nó:
+#   source: arquivo de entrada; muda quando (mtime, tamanho) do arquivo muda
+#   value:  valor externo barato (ex.: a data de hoje); muda quando o valor muda
+#   metric: função pura de colunas declaradas de sources e/ou saídas de outras métricas
+# Uma métrica só é recalculada se a impressão digital das suas entradas mudou.
+# Para entradas de arquivo, a impressão é o hash das COLUNAS declaradas,
+# então mudar uma coluna não usada recarrega o arquivo mas não a métrica.
+
+def _file_stamp(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _frame_hash(df: pd.DataFrame) -> tuple:
+    if df.shape[1] == 0:
+        return (len(df),)
+    try:
+        h = int(pd.util.hash_pandas_object(df, index=False).sum())
+    except TypeError:  # valores não hasheáveis (listas/dicts)
+        h = int(pd.util.hash_pandas_object(df.astype(str), index=False).sum())
+    return (len(df), tuple(df.columns), h)
+
+class _Node:
+    __slots__ = ("name", "kind", "fn", "path", "inputs", "deps")
+
+    def __init__(self, name, kind, fn, path=None, inputs=None, deps=None):
+        self.name = name
+        self.kind = kind
+        self.fn = fn
+        self.path = path
+        self.inputs = inputs or {}  # source -> colunas
+        self.deps = deps or []      # outras métricas/values
+
+class MetricGraph:
+    """
+    DAG de métricas nomeadas; guarda saídas e só recalcula os nós afetados.
+    `run`/`invalidate` são serializados por uma trava (refreshes em threads distintas).
+    """
+
+    def __init__(self, name: str = "metricas"):
+        self.name = name
+        self._nodes: dict[str, _Node] = {}
+        self._state: dict = {}  # nome -> (chave de entrada, impressão de saída, saída)
+        self._proj: dict = {}   # (source, colunas) -> (impressão do source, hash da projeção)
+        self.last_run = {"recomputados": [], "reutilizados": []}
+        self._lock = threading.RLock()
+
+    # ---------- declaração ----------
+    def _add(self, node: _Node):
+        if node.name in self._nodes:
+            raise ValueError(f"Nó duplicado: {node.name}")
+        for dep in list(node.inputs) + node.deps:
+            if dep not in self._nodes:
+                raise ValueError(f"Nó '{node.name}' depende de '{dep}', ainda não declarado")
+        self._nodes[node.name] = node
+
+    def source(self, name: str, path: str, loader):
+        """Arquivo de entrada; `loader()` devolve o DataFrame."""
+        self._add(_Node(name, "source", loader, path=path))
+
+    def value(self, name: str, fn):
+        """Valor externo recalculado a cada execução (deve ser barato e hasheável)."""
+        self._add(_Node(name, "value", fn))
+
+    def metric(self, name: str, fn, inputs: dict[str, list[str]] | None = None, deps: list[str] | None = None):
+        """
+        Métrica `fn(**kwargs)`: recebe cada source de `inputs` projetado nas colunas
+        declaradas e a saída de cada nó em `deps`, pelos respectivos nomes.
+        """
+        for src in (inputs or {}):
+            if src in self._nodes and self._nodes[src].kind != "source":
+                raise ValueError(f"'{src}' não é um source")
+        self._add(_Node(name, "metric", fn, inputs=inputs, deps=deps))
+
+    # ---------- execução ----------
+    def _projection(self, src: str, cols: list[str], recomputed: set):
+        df = self._state[src][2]
+        proj = df[[c for c in cols if c in df.columns]]
+        key = (src, tuple(cols))
+        cached = self._proj.get(key)
+        if cached is not None and src not in recomputed and cached[0] == self._state[src][1]:
+            return proj, cached[1]
+        h = _frame_hash(proj)
+        self._proj[key] = (self._state[src][1], h)
+        return proj, h
+
+    def run(self, targets: list[str] | None = None) -> dict:
+        """
+        Executa (ou reaproveita) os nós necessários para `targets` (todos, por padrão).
+        As saídas devolvidas SÃO o cache: copie antes de alterar.
+        """
+        with self._lock:
+            return self._run(targets)
+
+    def _run(self, targets: list[str] | None) -> dict:
+        order = self._order(targets or list(self._nodes))
+        recomputed: set = set()
+        reused = []
+        out = {}
+
+        for name in order:
+            node = self._nodes[name]
+            prev = self._state.get(name)
+
+            if node.kind == "source":
+                stamp = _file_stamp(node.path)
+                # arquivo que continua ausente (stamp None) também conta como inalterado
+                if prev is not None and prev[0] == stamp:
+                    reused.append(name)
+                else:
+                    self._state[name] = (stamp, stamp, node.fn())
+                    recomputed.add(name)
+            elif node.kind == "value":
+                v = node.fn()
+                if prev is not None and prev[0] == v:
+                    reused.append(name)
+                else:
+                    self._state[name] = (v, v, v)
+                    recomputed.add(name)
+            else:
+                kwargs, key = {}, []
+                for src, cols in node.inputs.items():
+                    kwargs[src], h = self._projection(src, cols, recomputed)
+                    key.append((src, h))
+                for dep in node.deps:
+                    kwargs[dep] = self._state[dep][2]
+                    key.append((dep, self._state[dep][1]))
+                key = tuple(key)
+                if prev is not None and prev[0] == key:
+                    reused.append(name)
+                else:
+                    self._state[name] = (key, (name, hash(key)), node.fn(**kwargs))
+                    recomputed.add(name)
+            out[name] = self._state[name][2]
+
+        self.last_run = {
+            "recomputados": [n for n in order if n in recomputed],
+            "reutilizados": reused,
+        }
+        return out
+
+    def _order(self, targets: list[str]) -> list[str]:
+        seen, order = set(), []
+
+        def visit(n):
+            if n in seen:
+                return
+            seen.add(n)
+            node = self._nodes[n]
+            for d in list(node.inputs) + node.deps:
+                visit(d)
+            order.append(n)
+
+        for t in targets:
+            visit(t)
+        return order
+
+    def invalidate(self, *names: str):
+        """Força a recomputação dos nós informados (ou de todos) na próxima execução."""
+        with self._lock:
+            for n in names or list(self._state):
+                self._state.pop(n, None)
+
+    def report(self) -> dict:
+        """Nós recalculados/reaproveitados na última execução e as dependências declaradas."""
+        return {
+            "grafo": self.name,
+            **self.last_run,
+            "nos": {
+                n: {"tipo": node.kind, "arquivo": node.path, "colunas": node.inputs, "deps": node.deps}
+                for n, node in self._nodes.items()
+            },
+        }
@@ -1,9 +1,12 @@
 import numpy as np
 import pandas as pd
+from core.data_loader import is_canonical, to_numeric, as_datetime
 
 # ========= Admin (API_ready) =========
 
 def normalize_saleschannel(order: pd.DataFrame) -> pd.DataFrame:
+    if is_canonical(order, "saleschannel"):
+        return order
     if "saleschannel" not in order.columns and "salesChannel" in order.columns:
         order = order.rename(columns={"salesChannel": "saleschannel"})
     if "saleschannel" in order.columns:
@@ -14,11 +17,8 @@ def admin_summary(order: pd.DataFrame, customer: pd.DataFrame) -> dict:
     if order.empty or customer.empty:
         return {"ticket_medio_geral": 0.0, "tempo_medio_preparo": 0.0, "total_pedidos": 0, "total_clientes": 0}
 
-    # conversões seguras
-    if "total.orderamount" in order.columns:
-        order["total.orderamount"] = pd.to_numeric(order["total.orderamount"], errors="coerce")
-    if "preparationtime" in order.columns:
-        order["preparationtime"] = pd.to_numeric(order["preparationtime"], errors="coerce")
+    # conversões seguras (no-op para frames canônicos)
+    order = to_numeric(order, ["total.orderamount", "preparationtime"])
 
     return {
         "ticket_medio_geral": round(order["total.orderamount"].mean(skipna=True), 2),
@@ -110,7 +110,94 @@ def inactivity_rate(customers: pd.DataFrame, days: int, now=None) -> tuple[int,
         return 0, 0.0
     now = pd.Timestamp.utcnow() if now is None else now
     customers = customers.copy()
-    customers["lastOrder"] = pd.to_datetime(customers["lastOrder"], errors="coerce", utc=True)
+    customers["lastOrder"] = as_datetime(customers, "lastOrder")
     inativos = customers[customers["lastOrder"] < (now - pd.Timedelta(days=days))]
     taxa = round((len(inativos) / max(len(customers),1)) * 100, 2)
     return len(inativos), taxa
+
+# ========= Log binário de pedidos (core.order_log, memmap) =========
+
+def _log_window(rec: np.ndarray, start=None, end=None) -> np.ndarray:
+    if start is None and end is None:
+        return rec
+    ts = rec["ts"]
+    mask = np.ones(len(rec), dtype=bool)
+    if start is not None:
+        mask &= ts >= int(pd.Timestamp(start).timestamp())
+    if end is not None:
+        mask &= ts < int(pd.Timestamp(end).timestamp())
+    return rec[mask]
+
+def _log_codes(rec: np.ndarray, field: str, size: int) -> np.ndarray:
+    """Códigos de `field` validados contra o dicionário (evita que bincount os misture)."""
+    codes = rec[field].astype(np.int64)
+    if len(codes) and (codes.min() < 0 or codes.max() >= size):
+        raise ValueError(f"Log de pedidos com código de '{field}' fora do dicionário ({size} entradas); "
+                         "leia os registros antes dos dicionários")
+    return codes
+
+def _log_grouped(codes: np.ndarray, nbins: int, rec: np.ndarray) -> dict:
+    """Contagens, somas e médias por código via bincount (ignora NaN como o pandas)."""
+    amount = rec["amount"]
+    prep = rec["prep_time"].astype(np.float64)
+    ok_a, ok_p = ~np.isnan(amount), ~np.isnan(prep)
+    pedidos = np.bincount(codes, minlength=nbins)
+    receita = np.bincount(codes[ok_a], weights=amount[ok_a], minlength=nbins)
+    n_a = np.bincount(codes[ok_a], minlength=nbins)
+    soma_p = np.bincount(codes[ok_p], weights=prep[ok_p], minlength=nbins)
+    n_p = np.bincount(codes[ok_p], minlength=nbins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "pedidos": pedidos,
+            "receita": np.round(receita, 2),
+            "ticket_medio": np.round(receita / n_a, 2),
+            "tempo_medio": np.round(soma_p / n_p, 2),
+        }
+
+def log_summary(rec: np.ndarray, start=None, end=None) -> dict:
+    """Resumo de pedidos (sem total_clientes) direto dos registros do log."""
+    rec = _log_window(rec, start, end)
+    if len(rec) == 0:
+        return {"ticket_medio_geral": 0.0, "tempo_medio_preparo": 0.0, "total_pedidos": 0}
+    amount = rec["amount"]
+    prep = rec["prep_time"].astype(np.float64)
+    return {
+        "ticket_medio_geral": round(float(np.nanmean(amount)), 2) if (~np.isnan(amount)).any() else float("nan"),
+        "tempo_medio_preparo": round(float(np.nanmean(prep)), 2) if (~np.isnan(prep)).any() else float("nan"),
+        "total_pedidos": int(len(rec)),
+    }
+
+def log_kpis_by_channel(rec: np.ndarray, channels: list[str], start=None, end=None) -> pd.DataFrame:
+    rec = _log_window(rec, start, end)
+    cols = ["saleschannel", "pedidos", "receita", "ticket_medio", "tempo_medio"]
+    if len(rec) == 0:
+        return pd.DataFrame(columns=cols)
+    g = _log_grouped(_log_codes(rec, "channel", len(channels)), len(channels), rec)
+    out = pd.DataFrame({"saleschannel": np.asarray(channels, dtype=object), **g})
+    return out[out["pedidos"] > 0].sort_values("saleschannel").reset_index(drop=True)[cols]
+
+def log_kpis_by_store(rec: np.ndarray, stores: list[str], channels: list[str], start=None, end=None) -> pd.DataFrame:
+    rec = _log_window(rec, start, end)
+    cols = ["store.name", "saleschannel", "pedidos", "receita", "ticket_medio", "tempo_medio"]
+    if len(rec) == 0:
+        return pd.DataFrame(columns=cols)
+    nch = max(len(channels), 1)
+    combo = _log_codes(rec, "store", len(stores)) * nch + _log_codes(rec, "channel", len(channels))
+    g = _log_grouped(combo, len(stores) * nch, rec)
+    idx = np.arange(len(stores) * nch)
+    out = pd.DataFrame({
+        "store.name": np.asarray(stores, dtype=object)[idx // nch],
+        "saleschannel": np.asarray(channels, dtype=object)[idx % nch],
+        **g,
+    })
+    out = out[out["pedidos"] > 0].sort_values(["store.name", "saleschannel"])
+    return out.sort_values("receita", ascending=False, na_position="last", kind="mergesort").reset_index(drop=True)[cols]
+
+def log_orders(rec: np.ndarray, stores: list[str], channels: list[str]) -> pd.DataFrame:
+    """Registros do log como pedidos canônicos (loja, canal, valor, preparo), sem ler o JSON."""
+    return pd.DataFrame({
+        "store.name": pd.Categorical.from_codes(_log_codes(rec, "store", len(stores)), stores),
+        "saleschannel": pd.Categorical.from_codes(_log_codes(rec, "channel", len(channels)), channels),
+        "total.orderamount": rec["amount"].astype(np.float64),
+        "preparationtime": rec["prep_time"].astype(np.float64),
+    })
@@ -0,0 +1,139 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from core.data_loader import BASE_DATA_DIR, as_numeric, as_datetime
+
+try:
+    import fcntl  # trava entre processos (POSIX)
+except ImportError:
+    fcntl = None
+
+# ========= Log binário de pedidos (append-only, registros de largura fixa) =========
+
+RECORD_DTYPE = np.dtype([
+    ("ts", "<i8"),            # epoch em segundos (UTC)
+    ("amount", "<f8"),
+    ("delivery_fee", "<f8"),
+    ("prep_time", "<f4"),
+    ("store", "<i4"),         # códigos de dicionário (arquivo .dict.json)
+    ("channel", "<i4"),
+    ("status", "<i4"),
+    ("customer", "<i4"),
+])
+
+DICT_FIELDS = ("store", "channel", "status", "customer")
+
+# campo do log -> colunas aceitas (API_ready canônico / pedidos por período)
+SOURCE_COLS = {
+    "ts": ("createdat", "createdAt"),
+    "amount": ("total.orderamount", "total.orderAmount"),
+    "delivery_fee": ("total.deliveryfee", "total.deliveryFee"),
+    "prep_time": ("preparationtime", "delivery.preparationTime"),
+    "store": ("store.name", "merchant.name"),
+    "channel": ("saleschannel", "salesChannel"),
+    "status": ("status",),
+    "customer": ("customer.id",),
+}
+
+DEFAULT_LOG_PATH = os.path.join(BASE_DATA_DIR, "orders_log")
+
+def _pick(df: pd.DataFrame, field: str):
+    for c in SOURCE_COLS[field]:
+        if c in df.columns:
+            return c
+    return None
+
+class OrderLog:
+    """
+    Pedidos em `<path>.bin` (registros RECORD_DTYPE) + dicionários em `<path>.dict.json`.
+    Leitura via np.memmap (zero-cópia, compartilhável entre processos);
+    `append` só acrescenta ao fim, sem reescrever o histórico.
+    """
+
+    def __init__(self, path: str = DEFAULT_LOG_PATH):
+        self.bin_path = f"{path}.bin"
+        self.dict_path = f"{path}.dict.json"
+
+    # ---------- dicionários ----------
+    def dictionaries(self) -> dict:
+        try:
+            with open(self.dict_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {k: [] for k in DICT_FIELDS}
+
+    def _write_dictionaries(self, dicts: dict):
+        tmp = f"{self.dict_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dicts, f, ensure_ascii=False)
+        os.replace(tmp, self.dict_path)
+
+    # ---------- escrita ----------
+    def _encode(self, orders: pd.DataFrame, dicts: dict) -> np.ndarray:
+        rec = np.zeros(len(orders), dtype=RECORD_DTYPE)
+
+        ts_col = _pick(orders, "ts")
+        if ts_col is not None:
+            ts = as_datetime(orders, ts_col)
+            rec["ts"] = np.where(ts.isna(), 0, ts.dt.tz_convert(None).to_numpy().astype("datetime64[s]").astype(np.int64))
+        for field in ("amount", "delivery_fee", "prep_time"):
+            c = _pick(orders, field)
+            rec[field] = as_numeric(orders, c).to_numpy(dtype=float) if c is not None else np.nan
+
+        for field in DICT_FIELDS:
+            c = _pick(orders, field)
+            values = orders[c].fillna("Desconhecido").astype(str) if c is not None else pd.Series("Desconhecido", index=orders.index)
+            codes, uniques = pd.factorize(values)
+            known = {v: i for i, v in enumerate(dicts[field])}
+            remap = np.empty(len(uniques), dtype=np.int32)
+            for i, v in enumerate(uniques):
+                if v not in known:
+                    known[v] = len(dicts[field])
+                    dicts[field].append(v)
+                remap[i] = known[v]
+            rec[field] = remap[codes]
+        return rec
+
+    def append(self, orders: pd.DataFrame) -> int:
+        """Codifica e acrescenta pedidos ao log; retorna quantos registros foram gravados."""
+        if orders is None or orders.empty:
+            return 0
+        os.makedirs(os.path.dirname(self.bin_path) or ".", exist_ok=True)
+        with open(self.bin_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                dicts = self.dictionaries()
+                rec = self._encode(orders, dicts)
+                # dicionário antes dos dados: leitores nunca veem um código desconhecido
+                self._write_dictionaries(dicts)
+                f.write(rec.tobytes())
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return len(rec)
+
+    # ---------- leitura ----------
+    def records(self) -> np.ndarray:
+        """Registros como memmap somente-leitura (ignora um registro final incompleto)."""
+        try:
+            n = os.path.getsize(self.bin_path) // RECORD_DTYPE.itemsize
+        except FileNotFoundError:
+            n = 0
+        if n == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.bin_path, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+
+    def __len__(self) -> int:
+        return len(self.records())
+
+def build_order_log(orders: pd.DataFrame, path: str = DEFAULT_LOG_PATH) -> OrderLog:
+    """(Re)cria o log a partir de um DataFrame de pedidos (carga inicial)."""
+    log = OrderLog(path)
+    for p in (log.bin_path, log.dict_path):
+        if os.path.exists(p):
+            os.remove(p)
+    log.append(orders)
+    return log
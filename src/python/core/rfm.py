@@ -0,0 +1,225 @@
+import numpy as np
+import pandas as pd
+from core.data_loader import as_numeric, as_datetime
+
+# ========= RFM (recência / frequência / valor) por cliente =========
+
+SEGMENTOS = np.array(["Regular", "New", "Loyal", "VIP", "At Risk", "Lost"], dtype=object)
+
+def _first_col(df: pd.DataFrame, *names):
+    for n in names:
+        if n in df.columns:
+            return n
+    return None
+
+class RFMTable:
+    """
+    Tabela colunar (arrays numpy) de features RFM indexada por id do cliente.
+    `update` agrega apenas os pedidos novos e reescreve só as linhas tocadas.
+    """
+
+    def __init__(self, capacity: int = 1024,
+                 vip_monetary: float = 500.0, loyal_frequency: int = 3,
+                 churn_days: int = 45, lost_days: int = 90, active_days: int = 30):
+        self.vip_monetary = vip_monetary
+        self.loyal_frequency = loyal_frequency
+        self.churn_days = churn_days
+        self.lost_days = lost_days
+        self.active_days = active_days
+
+        self._pos: dict[str, int] = {}
+        self._n = 0
+        self._alloc(max(int(capacity), 1))
+        self.as_of = None  # epoch (s) de referência da última segmentação
+        self._seen = None  # hash por id de pedido já incorporado (usado por `sync`)
+
+    def reset(self):
+        """Esvazia a tabela mantendo os parâmetros de segmentação."""
+        self._pos = {}
+        self._n = 0
+        self._ids = None
+        self._alloc(len(self._first))
+        self.as_of = None
+        self._seen = None
+
+    def _alloc(self, cap: int):
+        old = getattr(self, "_ids", None)
+        ids = np.empty(cap, dtype=object)
+        first = np.full(cap, np.iinfo(np.int64).max, dtype=np.int64)
+        last = np.full(cap, np.iinfo(np.int64).min, dtype=np.int64)
+        freq = np.zeros(cap, dtype=np.int64)
+        monetary = np.zeros(cap, dtype=np.float64)
+        segment = np.zeros(cap, dtype=np.int8)
+        seg_ref = np.zeros(cap, dtype=np.int64)  # data de referência com que cada linha foi segmentada
+        if old is not None:
+            n = self._n
+            ids[:n], first[:n], last[:n] = self._ids[:n], self._first[:n], self._last[:n]
+            freq[:n], monetary[:n], segment[:n] = self._freq[:n], self._monetary[:n], self._segment[:n]
+            seg_ref[:n] = self._seg_ref[:n]
+        self._ids, self._first, self._last = ids, first, last
+        self._freq, self._monetary, self._segment = freq, monetary, segment
+        self._seg_ref = seg_ref
+
+    def __len__(self) -> int:
+        return self._n
+
+    # ---------- ingestão ----------
+    def update(self, orders: pd.DataFrame, now=None) -> np.ndarray:
+        """
+        Incorpora um lote de pedidos (delta) e re-segmenta apenas os clientes tocados.
+        Retorna os ids tocados. Mesmo sem pedidos, `now` avança `as_of`
+        (as linhas não tocadas passam a aparecer em `stale_rows`).
+        """
+        if now is not None:
+            self._ref_epoch(now, 0)
+        if orders is None or orders.empty:
+            return np.empty(0, dtype=object)
+
+        cid = _first_col(orders, "customer.id", "customerId", "customerid")
+        val = _first_col(orders, "total.orderAmount", "total.orderamount", "totalAmount", "total")
+        ts = _first_col(orders, "createdAt", "createdat", "orderDate", "date")
+        if cid is None or val is None or ts is None:
+            return np.empty(0, dtype=object)
+
+        when = as_datetime(orders, ts)
+        delta = pd.DataFrame({
+            "cid": orders[cid].astype(str).to_numpy(),
+            "valor": as_numeric(orders, val).fillna(0.0).to_numpy(dtype=float),
+            "ts": when.dt.tz_convert(None).to_numpy(),
+        }).dropna(subset=["ts"])
+        if delta.empty:
+            return np.empty(0, dtype=object)
+        delta["ts"] = delta["ts"].astype("datetime64[s]").astype(np.int64)
+
+        # uma única passada agrupada sobre o delta
+        g = delta.groupby("cid", sort=False).agg(
+            n=("valor", "size"), soma=("valor", "sum"), ts_min=("ts", "min"), ts_max=("ts", "max"),
+        )
+        ids = g.index.to_numpy(dtype=object)
+        pos = self._positions(ids)
+
+        self._freq[pos] += g["n"].to_numpy()
+        self._monetary[pos] += g["soma"].to_numpy()
+        self._first[pos] = np.minimum(self._first[pos], g["ts_min"].to_numpy())
+        self._last[pos] = np.maximum(self._last[pos], g["ts_max"].to_numpy())
+
+        ref = self._ref_epoch(now, int(g["ts_max"].max()))
+        self._segment[pos] = self._segmentar(pos, ref)
+        self._seg_ref[pos] = ref
+        return ids
+
+    def sync(self, orders: pd.DataFrame, now=None, id_col: str = "id") -> int:
+        """
+        Acompanha um snapshot completo de pedidos: incorpora só os ids ainda não
+        vistos. Se algum pedido já incorporado sumiu ou mudou (arquivo regenerado),
+        reconstrói a tabela. Retorna quantos pedidos foram incorporados.
+        """
+        if orders is None or orders.empty or id_col not in orders.columns:
+            self.reset()
+            self.update(orders, now=now)
+            return 0 if orders is None else len(orders)
+        h = pd.Series(pd.util.hash_pandas_object(orders.astype(str), index=False).to_numpy(),
+                      index=orders[id_col].astype(str).to_numpy())
+        if self._seen is not None:
+            known = h.index.isin(self._seen.index)
+            mudou = (int(known.sum()) != len(self._seen)
+                     or not np.array_equal(h[known].to_numpy(), self._seen.reindex(h.index[known]).to_numpy()))
+            if not mudou:
+                novos = orders[~known]
+                self.update(novos, now=now)
+                self._seen = pd.concat([self._seen, h[~known]])
+                return len(novos)
+        self.reset()
+        self.update(orders, now=now)
+        self._seen = h
+        return len(orders)
+
+    def _positions(self, ids: np.ndarray) -> np.ndarray:
+        pos = np.empty(len(ids), dtype=np.int64)
+        novos = 0
+        for i, k in enumerate(ids):
+            p = self._pos.get(k)
+            if p is None:
+                p = self._n + novos
+                self._pos[k] = p
+                novos += 1
+            pos[i] = p
+        if self._n + novos > len(self._ids):
+            self._alloc(max(len(self._ids) * 2, self._n + novos))
+        self._ids[pos] = ids
+        self._n += novos
+        return pos
+
+    def _ref_epoch(self, now, fallback: int) -> int:
+        if now is not None:
+            ref = int(pd.Timestamp(now).timestamp())
+        else:
+            ref = max(fallback, self.as_of or fallback)
+        self.as_of = ref
+        return ref
+
+    # ---------- segmentação ----------
+    def _segmentar(self, pos, ref: int) -> np.ndarray:
+        rec = (ref - self._last[pos]) / 86400.0
+        freq = self._freq[pos]
+        mon = self._monetary[pos]
+        cond = [
+            rec > self.lost_days,
+            rec > self.churn_days,
+            (mon >= self.vip_monetary) & (freq >= self.loyal_frequency),
+            freq >= self.loyal_frequency,
+            (freq == 1) & (rec <= self.active_days),
+        ]
+        return np.select(cond, [5, 4, 3, 2, 1], default=0).astype(np.int8)
+
+    def resegment(self, now=None) -> None:
+        """Recalcula a segmentação de todos os clientes para uma nova data de referência."""
+        if self._n == 0:
+            return
+        ref = self._ref_epoch(now, int(self._last[:self._n].max()))
+        self._segment[:self._n] = self._segmentar(slice(0, self._n), ref)
+        self._seg_ref[:self._n] = ref
+
+    def stale_rows(self) -> int:
+        """Clientes cuja segmentação usa uma data de referência anterior a `as_of`."""
+        if self._n == 0 or self.as_of is None:
+            return 0
+        return int((self._seg_ref[:self._n] < self.as_of).sum())
+
+    # ---------- consulta ----------
+    def features(self) -> pd.DataFrame:
+        """
+        Retorna a tabela RFM como DataFrame (uma linha por cliente).
+        `recency_days` é relativa a `as_of`; `segment` foi calculado em
+        `segment_as_of`, e `segment_stale` marca as linhas segmentadas antes de `as_of`.
+        """
+        n = self._n
+        if n == 0:
+            return pd.DataFrame(columns=["customer_id", "recency_days", "frequency", "monetary",
+                                         "avg_ticket", "first_order", "last_order", "segment",
+                                         "segment_as_of", "segment_stale", "churn_risk"])
+        ref = self.as_of if self.as_of is not None else int(self._last[:n].max())
+        seg = self._segment[:n]
+        return pd.DataFrame({
+            "customer_id": self._ids[:n],
+            "recency_days": np.round((ref - self._last[:n]) / 86400.0, 1),
+            "frequency": self._freq[:n],
+            "monetary": np.round(self._monetary[:n], 2),
+            "avg_ticket": np.round(self._monetary[:n] / np.maximum(self._freq[:n], 1), 2),
+            "first_order": pd.to_datetime(self._first[:n], unit="s", utc=True),
+            "last_order": pd.to_datetime(self._last[:n], unit="s", utc=True),
+            "segment": SEGMENTOS[seg],
+            "segment_as_of": pd.to_datetime(self._seg_ref[:n], unit="s", utc=True),
+            "segment_stale": self._seg_ref[:n] < ref,
+            "churn_risk": seg >= 4,
+        })
+
+    def segment_counts(self) -> dict:
+        counts = np.bincount(self._segment[:self._n], minlength=len(SEGMENTOS))
+        return {str(s): int(c) for s, c in zip(SEGMENTOS, counts)}
+
+def build_rfm(orders: pd.DataFrame, now=None) -> RFMTable:
+    """Atalho: monta a tabela RFM a partir de todos os pedidos."""
+    table = RFMTable(capacity=max(len(orders), 1) if orders is not None else 1)
+    table.update(orders, now=now)
+    return table
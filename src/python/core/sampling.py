@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from core.data_loader import as_numeric
+
+# ========= Amostragem estratificada (reservatório por estrato) =========
+
+Z95 = 1.96
+
+def _estrato(col: pd.Series) -> pd.Series:
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # códigos prontos (ex.: log binário): agrupa pelos códigos, sem fatorar strings
+        col = col.cat.rename_categories([str(c) for c in col.cat.categories])
+        return col.cat.add_categories(["Desconhecido"]).fillna("Desconhecido") if col.isna().any() else col
+    return col.fillna("Desconhecido").astype(str)
+
+class StratifiedReservoir:
+    """
+    Mantém uma amostra uniforme de até `capacity` linhas por estrato (Algoritmo R),
+    atualizada incrementalmente. As contagens por estrato (N) são exatas; só as
+    colunas de `values` são amostradas. Cada buffer é mantido em ordem aleatória,
+    então qualquer prefixo dele também é uma amostra uniforme.
+    """
+
+    def __init__(self, strata: list[str], values: list[str], capacity: int = 200, seed: int = 42):
+        self.strata = list(strata)
+        self.values = list(values)
+        self.capacity = max(int(capacity), 1)
+        self.rows_seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._seed = seed
+        self._data: dict = {}  # chave do estrato -> {"N", "k", "buf"}
+        self._estimates: dict = {}  # (group_by, fraction) -> DataFrame; vale até o próximo add
+        self._prefix = 0  # assinatura das linhas já vistas por `sync`
+
+    def reset(self):
+        self.rows_seen = 0
+        self._prefix = 0
+        self._rng = np.random.default_rng(self._seed)
+        self._data = {}
+        self._estimates = {}
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Incorpora novas linhas (delta); retorna quantas foram vistas."""
+        if df is None or df.empty:
+            return 0
+        self._estimates = {}
+        vals = np.column_stack([
+            as_numeric(df, c).to_numpy(dtype=float) if c in df.columns else np.full(len(df), np.nan)
+            for c in self.values
+        ])
+        keys = pd.DataFrame({
+            s: (_estrato(df[s]) if s in df.columns else "Desconhecido")
+            for s in self.strata
+        }, index=df.index)
+        for key, idx in keys.groupby(self.strata, sort=False, observed=True).indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+            self._add_stratum(key, vals[idx])
+        self.rows_seen += len(df)
+        return len(df)
+
+    def sync(self, df: pd.DataFrame) -> int:
+        """
+        Acompanha uma fonte append-only: só adiciona as linhas além de `rows_seen`.
+        Se as linhas já vistas mudaram (arquivo reescrito, não só acrescido), recomeça.
+        """
+        if df is None:
+            return 0
+        cols = [c for c in self.strata + self.values if c in df.columns]
+        h = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+        if len(df) < self.rows_seen or int(h[:self.rows_seen].sum()) != self._prefix:
+            self.reset()
+        added = self.add(df.iloc[self.rows_seen:])
+        self._prefix = int(h.sum())  # soma uint64 (com estouro): barata e incremental
+        return added
+
+    def _add_stratum(self, key: tuple, v: np.ndarray):
+        st = self._data.get(key)
+        if st is None:
+            st = self._data[key] = {"N": 0, "k": 0, "buf": np.empty((self.capacity, len(self.values)))}
+        take = min(self.capacity - st["k"], len(v))
+        if take > 0:
+            buf = st["buf"]
+            # Fisher-Yates "de dentro para fora": cada item entra numa posição aleatória
+            for i, j in enumerate(self._rng.integers(0, np.arange(st["k"] + 1, st["k"] + take + 1)), st["k"]):
+                buf[i] = buf[j]
+                buf[j] = v[i - st["k"]]
+            st["k"] += take
+            st["N"] += take
+        rest = v[take:]
+        if len(rest):
+            t = st["N"] + np.arange(1, len(rest) + 1)  # posição de cada item no fluxo do estrato
+            j = self._rng.integers(0, t)
+            keep = j < self.capacity
+            st["buf"][j[keep]] = rest[keep]  # ordem preservada: o último a cair na vaga prevalece
+            st["N"] += len(rest)
+
+    def estimate(self, group_by: list[str] | None = None, fraction: float = 1.0) -> pd.DataFrame:
+        """
+        Estimativas por grupo (subconjunto das dimensões de estrato; [] = total):
+        N exato, n amostrado e, para cada coluna de `values`, total/média com
+        meia-largura do IC 95% (`<col>_total_ic`, `<col>_media_ic`).
+        `fraction` < 1 usa só um prefixo de cada reservatório (já embaralhado),
+        o que equivale a uma subamostra aleatória (prévia mais barata).
+        """
+        group_by = list(group_by or [])
+        memo = (tuple(group_by), float(fraction))
+        if memo not in self._estimates:
+            self._estimates[memo] = self._estimate(group_by, fraction)
+        return self._estimates[memo].copy()
+
+    def _estimate(self, group_by: list[str], fraction: float) -> pd.DataFrame:
+        pos = [self.strata.index(g) for g in group_by]
+        m = len(self.values)
+        acc: dict = {}
+
+        for key, st in self._data.items():
+            n = max(1, int(np.ceil(st["k"] * fraction))) if st["k"] else 0
+            sample = st["buf"][:n]
+            N = st["N"]
+            valid = ~np.isnan(sample)
+            nv = valid.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(nv > 0, np.nansum(sample, axis=0) / nv, np.nan)
+                var = np.where(nv > 1, np.nansum((sample - mean) ** 2, axis=0) / (nv - 1), 0.0)
+                fpc = np.clip(1.0 - nv / N, 0.0, 1.0)
+                var_total = np.where(nv > 0, N ** 2 * fpc * var / nv, np.nan)
+            total = N * mean
+
+            g = tuple(key[p] for p in pos)
+            a = acc.setdefault(g, {"N": 0, "n": 0, "total": np.zeros(m), "var": np.zeros(m), "N_valid": np.zeros(m)})
+            a["N"] += N
+            a["n"] += n
+            has = nv > 0
+            a["total"] += np.where(has, total, 0.0)
+            a["var"] += np.where(has, var_total, 0.0)
+            a["N_valid"] += np.where(has, N, 0)
+
+        rows = []
+        for g, a in acc.items():
+            row = dict(zip(group_by, g))
+            row["N"], row["n"] = int(a["N"]), int(a["n"])
+            half_total = Z95 * np.sqrt(a["var"])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                media = a["total"] / a["N_valid"]
+                half_media = half_total / a["N_valid"]
+            for i, c in enumerate(self.values):
+                row[f"{c}_total"] = float(a["total"][i]) if a["N_valid"][i] else np.nan
+                row[f"{c}_total_ic"] = float(half_total[i]) if a["N_valid"][i] else np.nan
+                row[f"{c}_media"] = float(media[i]) if a["N_valid"][i] else np.nan
+                row[f"{c}_media_ic"] = float(half_media[i]) if a["N_valid"][i] else np.nan
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+def ic(estimativa: float, meia_largura: float, nd: int = 2) -> list[float]:
+    """Intervalo [inferior, superior] arredondado."""
+    if estimativa is None or np.isnan(estimativa):
+        return [np.nan, np.nan]
+    return [round(float(estimativa - meia_largura), nd), round(float(estimativa + meia_largura), nd)]
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# garante path correto
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from service.admin_insights_service import get_admin_dashboard
+from service.client_insights_service import PERIODOS, get_client_insights
+
+# ========= Worker de longa duração =========
+# Protocolo (uma linha JSON por mensagem):
+#   stdin:  {"id": 1, "role": "admin"|"client", "period": "30d"}
+#   stdout: {"id": 1, "ok": true, "result": {...}}  ou  {"id": 1, "ok": false, "error": "..."}
+# role/period fora de HANDLERS/PERIODOS são recusados antes de chegar aos caches
+# (cada período distinto cria um grafo e uma entrada de cache que nunca expiram).
+# As requisições rodam em threads, então pedidos iguais e simultâneos são
+# coalescidos pelos caches de get_admin_dashboard/get_client_insights e os
+# grafos de métricas ficam quentes entre requisições.
+
+HANDLERS = {
+    "admin": get_admin_dashboard,
+    "client": get_client_insights,
+}
+
+def _sem_nan(v):
+    # JSON.parse do Node não aceita NaN/Infinity
+    if isinstance(v, float) and not math.isfinite(v):
+        return None
+    if isinstance(v, dict):
+        return {k: _sem_nan(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_sem_nan(x) for x in v]
+    return v
+
+def main():
+    out = sys.stdout
+    sys.stdout = sys.stderr  # prints dos serviços não podem corromper o protocolo
+    lock = threading.Lock()
+
+    def send(msg: dict):
+        try:
+            line = json.dumps(msg, ensure_ascii=False, allow_nan=False)
+        except ValueError:
+            line = json.dumps(_sem_nan(msg), ensure_ascii=False)
+        with lock:
+            out.write(line + "\n")
+            out.flush()
+
+    def handle(req: dict):
+        role, period = req.get("role", "client"), req.get("period", "30d")
+        if role not in HANDLERS or period not in PERIODOS:
+            send({"id": req.get("id"), "ok": False,
+                  "error": f"role/período inválido: {role!r}/{period!r} (períodos: {', '.join(PERIODOS)})"})
+            return
+        try:
+            send({"id": req.get("id"), "ok": True, "result": HANDLERS[role](period)})
+        except Exception as e:
+            send({"id": req.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+    threads = int(os.environ.get("INSIGHTS_WORKER_THREADS", 8))
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                req = json.loads(line)
+            except ValueError as e:
+                send({"id": None, "ok": False, "error": f"requisição inválida: {e}"})
+                continue
+            pool.submit(handle, req)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,107 @@
-from core.data_loader import load_api_ready, to_numeric
-from core.metrics import (
-    normalize_saleschannel, admin_summary, kpis_by_store, kpis_by_channel, campaign_engagement
-)
+import os
+import copy
+import threading
+from core.coalescing import CoalescingCache, env_seconds
+from core.data_loader import API_READY, BASE_DATA_DIR, load_api_ready_file
+from core.data_source import get_source, JsonDataSource, OrderLogDataSource
+from core.metric_graph import MetricGraph
+from core.metrics import admin_summary, kpis_by_store, kpis_by_channel, campaign_engagement, log_orders
+from core.order_log import OrderLog
 from core.recommendations import admin_recommendations
+from core.sampling import StratifiedReservoir, ic
+
+ORDER_KPI_COLS = ["id", "orderid", "store.name", "saleschannel", "total.orderamount", "preparationtime"]
+ORDER_SAMPLE_STRATA = ["store.name", "saleschannel"]
+ORDER_SAMPLE_VALUES = ["total.orderamount", "preparationtime"]
+
+ADMIN_REPORT = ["resumo", "lojas", "canais", "campanhas", "recomendacoes"]
+
+def _novo_reservatorio() -> StratifiedReservoir:
+    return StratifiedReservoir(
+        ORDER_SAMPLE_STRATA, ORDER_SAMPLE_VALUES,
+        capacity=int(os.environ.get("INSIGHTS_SAMPLE_PER_STRATUM", 200)),
+    )
+
+# Reservatórios persistentes: cada atualização incorpora só os pedidos novos
+# (fontes append-only). O lock cobre atualização + estimativas, que não podem
+# se intercalar com um `add`.
+_amostra_lock = threading.Lock()
+_amostra_json = _novo_reservatorio()
+_amostras_log: dict = {}  # .bin do log -> (identidade do arquivo, último registro visto, reservatório)
+
+def _amostra_pedidos(order) -> StratifiedReservoir:
+    # recomeça sozinho se o arquivo foi reescrito em vez de acrescido
+    _amostra_json.sync(order)
+    return _amostra_json
+
+def _amostra_do_log(log: OrderLog) -> StratifiedReservoir:
+    """Reservatório alimentado pelo fim do log binário (memmap): só registros além de `rows_seen`."""
+    rec = log.records()
+    dicts = log.dictionaries()  # depois dos registros, como em OrderLogDataSource
+    try:
+        st = os.stat(log.bin_path)
+        ident = (st.st_dev, st.st_ino)
+    except OSError:
+        ident = None
+    prev = _amostras_log.get(log.bin_path)
+    if prev is None or prev[0] != ident:
+        sample = _novo_reservatorio()  # log novo ou recriado (build_order_log)
+    else:
+        _, ultimo, sample = prev
+        n = sample.rows_seen
+        if len(rec) < n or (n and rec[n - 1].tobytes() != ultimo):
+            sample.reset()
+    sample.add(log_orders(rec[sample.rows_seen:], dicts["store"], dicts["channel"]))
+    ultimo = rec[sample.rows_seen - 1].tobytes() if sample.rows_seen else None
+    _amostras_log[log.bin_path] = (ident, ultimo, sample)
+    return sample
+
+def _build_admin_graph() -> MetricGraph:
+    g = MetricGraph("admin")
+    for name, (filename, _) in API_READY.items():
+        g.source(name, os.path.join(BASE_DATA_DIR, filename), lambda name=name: load_api_ready_file(name))
 
-def generate_admin_dashboard(period: str = "30d") -> dict:
-    campaign, cq, customer, order = load_api_ready()
+    g.metric("resumo", lambda order, customer: admin_summary(order, customer),
+             inputs={"order": ["total.orderamount", "preparationtime"], "customer": ["id"]})
+    g.metric("lojas", lambda order: kpis_by_store(order).head(10).to_dict(orient="records"),
+             inputs={"order": ORDER_KPI_COLS})
+    g.metric("canais", lambda order: kpis_by_channel(order).to_dict(orient="records"),
+             inputs={"order": ORDER_KPI_COLS})
+    g.metric("campanhas", lambda campaign, cq: campaign_engagement(campaign, cq),
+             inputs={"campaign": ["id", "name", "store.name", "badge"], "cq": ["campaignid", "response"]})
+    g.metric("recomendacoes", lambda resumo, campanhas: admin_recommendations(resumo, campanhas),
+             deps=["resumo", "campanhas"])
+    # modo aproximado (fora de ADMIN_REPORT): quando as colunas amostradas mudam,
+    # o reservatório recebe só as linhas novas
+    g.metric("amostra_pedidos", lambda order: _amostra_pedidos(order),
+             inputs={"order": ORDER_SAMPLE_STRATA + ORDER_SAMPLE_VALUES})
+    g.metric("total_clientes", lambda customer: len(customer), inputs={"customer": ["id"]})
+    return g
 
-    # normalizações
-    order = normalize_saleschannel(order)
-    order = to_numeric(order, ["total.orderamount", "preparationtime"])
+_admin_graph = _build_admin_graph()
 
-    resumo = admin_summary(order, customer)
-    lojas  = kpis_by_store(order).head(10).to_dict(orient="records")
-    canais = kpis_by_channel(order).to_dict(orient="records")
-    campanhas = campaign_engagement(campaign, cq)
+def admin_graph_report() -> dict:
+    """Quais nós do painel admin foram recalculados na última geração."""
+    return _admin_graph.report()
 
-    recomendacoes = admin_recommendations(resumo, campanhas)
+def generate_admin_dashboard(period: str = "30d", source=None, approx: bool = False, fraction: float = 1.0) -> dict:
+    # JSON em memória por padrão; SQLDataSource empurra os GROUP BYs para o banco
+    source = source or get_source()
+    if approx:
+        return generate_admin_dashboard_approx(period, source, fraction)
+
+    if isinstance(source, JsonDataSource):
+        # arquivos locais: grafo de métricas, só recalcula o que mudou
+        # (cópia: as saídas do grafo são o cache e não podem ser alteradas por quem chama)
+        out = copy.deepcopy(_admin_graph.run(ADMIN_REPORT))
+        resumo, lojas, canais = out["resumo"], out["lojas"], out["canais"]
+        campanhas, recomendacoes = out["campanhas"], out["recomendacoes"]
+    else:
+        resumo = source.admin_summary()
+        lojas  = source.kpis_by_store(limit=10).to_dict(orient="records")
+        canais = source.kpis_by_channel().to_dict(orient="records")
+        campanhas = campaign_engagement(source.table("campaign"), source.table("cq"))
+        recomendacoes = admin_recommendations(resumo, campanhas)
 
     return {
         "restaurante": "Painel Administrativo Cannoli",
@@ -27,3 +112,104 @@ def generate_admin_dashboard(period: str = "30d") -> dict:
         "campanhas_resumo": campanhas,
         "recomendacoes": recomendacoes,
     }
+
+# ========= Modo aproximado (amostra estratificada por loja × canal) =========
+
+def _kpis_aprox(est, keys: list[str]) -> list[dict]:
+    rows = []
+    for r in est.to_dict(orient="records"):
+        receita = r["total.orderamount_total"]
+        rows.append({
+            **{k: r[k] for k in keys},
+            "pedidos": r["N"],
+            "receita": round(receita, 2),
+            "ticket_medio": round(r["total.orderamount_media"], 2),
+            "tempo_medio": round(r["preparationtime_media"], 2),
+            "receita_ic95": ic(receita, r["total.orderamount_total_ic"]),
+            "ticket_medio_ic95": ic(r["total.orderamount_media"], r["total.orderamount_media_ic"]),
+            "tempo_medio_ic95": ic(r["preparationtime_media"], r["preparationtime_media_ic"]),
+        })
+    return rows
+
+def _estimativas(sample: StratifiedReservoir, clientes: int, fraction: float):
+    total = sample.estimate([], fraction)
+    if total.empty or clientes == 0:
+        resumo = {"ticket_medio_geral": 0.0, "tempo_medio_preparo": 0.0, "total_pedidos": 0, "total_clientes": 0}
+        return resumo, [], [], 0, 0
+    t = {k: (float(v) if k not in ("N", "n") else v) for k, v in total.iloc[0].items()}
+    amostra, populacao = int(t["n"]), int(t["N"])
+    resumo = {
+        "ticket_medio_geral": round(t["total.orderamount_media"], 2),
+        "tempo_medio_preparo": round(t["preparationtime_media"], 2),
+        "total_pedidos": populacao,
+        "total_clientes": int(clientes),
+        "receita_total": round(t["total.orderamount_total"], 2),
+        "intervalos_95": {
+            "ticket_medio_geral": ic(t["total.orderamount_media"], t["total.orderamount_media_ic"]),
+            "tempo_medio_preparo": ic(t["preparationtime_media"], t["preparationtime_media_ic"]),
+            "receita_total": ic(t["total.orderamount_total"], t["total.orderamount_total_ic"]),
+        },
+    }
+    lojas = sorted(_kpis_aprox(sample.estimate(ORDER_SAMPLE_STRATA, fraction), ORDER_SAMPLE_STRATA),
+                   key=lambda r: (-r["receita"], r["store.name"], r["saleschannel"]))[:10]
+    canais = sorted(_kpis_aprox(sample.estimate(["saleschannel"], fraction), ["saleschannel"]),
+                    key=lambda r: r["saleschannel"])
+    return resumo, lojas, canais, amostra, populacao
+
+def generate_admin_dashboard_approx(period: str = "30d", source=None, fraction: float = 1.0) -> dict:
+    """
+    Painel admin estimado a partir da amostra estratificada de pedidos.
+    Contagens são exatas; receita, ticket e tempo vêm com IC 95%.
+    `fraction` < 1 usa só parte de cada reservatório (prévia mais rápida).
+    O reservatório é persistente e só recebe pedidos novos: no log binário lê
+    apenas os registros acrescidos (sem carregar o histórico nem o JSON de
+    pedidos); nos JSONs o arquivo ainda é lido, mas só as linhas novas entram.
+    SQL agrega no banco: ali o resultado é o exato.
+    """
+    source = source or get_source()
+    if not isinstance(source, (JsonDataSource, OrderLogDataSource)):
+        return {**generate_admin_dashboard(period, source), "modo": "exato"}
+
+    with _amostra_lock:
+        if isinstance(source, OrderLogDataSource):
+            out = _admin_graph.run(["total_clientes", "campanhas"])
+            sample = _amostra_do_log(source.log)
+        else:
+            out = _admin_graph.run(["amostra_pedidos", "total_clientes", "campanhas"])
+            sample = out["amostra_pedidos"]
+        resumo, lojas, canais, amostra, populacao = _estimativas(sample, out["total_clientes"], fraction)
+
+    campanhas = copy.deepcopy(out["campanhas"])
+    return {
+        "restaurante": "Painel Administrativo Cannoli",
+        "period": period,
+        "modo": "aproximado",
+        "amostra": {"fracao": fraction, "linhas": amostra, "populacao": populacao},
+        "resumo_geral": resumo,
+        "lojas_top": lojas,
+        "canais_venda": canais,
+        "campanhas_resumo": campanhas,
+        "recomendacoes": admin_recommendations(resumo, campanhas),
+    }
+
+def progressive_admin_dashboard(period: str = "30d", fractions=(0.1, 0.5), source=None):
+    """Gera prévias aproximadas crescentes e, por último, o painel exato."""
+    source = source or get_source()
+    if isinstance(source, (JsonDataSource, OrderLogDataSource)):
+        for f in fractions:
+            yield generate_admin_dashboard_approx(period, source, f)
+    yield {**generate_admin_dashboard(period, source), "modo": "exato"}
+
+# Cache compartilhado para processos de longa duração (várias requisições por processo).
+_admin_cache = CoalescingCache(
+    generate_admin_dashboard,
+    ttl=env_seconds("INSIGHTS_CACHE_TTL", 30.0),
+    stale_ttl=env_seconds("INSIGHTS_STALE_TTL", 300.0),
+)
+
+def get_admin_dashboard(period: str = "30d") -> dict:
+    """generate_admin_dashboard com coalescência de requisições e stale-while-revalidate."""
+    return _admin_cache.get(period)
+
+def admin_cache_stats() -> dict:
+    return _admin_cache.stats()
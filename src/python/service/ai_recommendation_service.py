@@ -13,6 +13,8 @@ def _as_dt(s: pd.Series, fallback: str | None = None) -> pd.Series:
     """Converte série para datetime de forma resiliente."""
     if s is None:
         return pd.Series(dtype="datetime64[ns]")
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        return s  # já canônica (core.data_loader.canonicalize)
     out = pd.to_datetime(s, errors="coerce", utc=True)
     if out.isna().all() and fallback and fallback in s.index:
         out = pd.to_datetime(s[fallback], errors="coerce", utc=True)
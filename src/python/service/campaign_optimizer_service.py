@@ -1,40 +1,43 @@
 import pandas as pd
+from core.campaign_cube import CampaignCube, campaign_cube
 
-def otimizar_campanhas(campaigns: pd.DataFrame) -> dict:
+def otimizar_campanhas(campaigns: pd.DataFrame | CampaignCube) -> dict:
     """Identifica canal, horário e tipo de campanha com melhor desempenho."""
-    if campaigns.empty:
+    cube = campaign_cube(campaigns)
+    if not cube.dims:
         return {}
 
     resultado = {}
 
-    if "salesChannel" in campaigns.columns:
-        canal = (
-            campaigns.groupby("salesChannel")["conversionRate"]
-            .mean()
-            .sort_values(ascending=False)
-            .head(1)
-        )
-        resultado["canal_ideal"] = canal.index[0]
-        resultado["taxa_canal"] = round(canal.iloc[0] * 100, 2)
-
-    if "hour" in campaigns.columns:
-        hora = (
-            campaigns.groupby("hour")["conversionRate"]
-            .mean()
-            .sort_values(ascending=False)
-            .head(1)
-        )
-        resultado["horario_ideal"] = f"{int(hora.index[0]):02d}:00h"
-        resultado["taxa_horario"] = round(hora.iloc[0] * 100, 2)
-
-    if "type" in campaigns.columns:
-        tipo = (
-            campaigns.groupby("type")["conversionRate"]
-            .mean()
-            .sort_values(ascending=False)
-            .head(1)
-        )
-        resultado["tipo_ideal"] = tipo.index[0]
-        resultado["taxa_tipo"] = round(tipo.iloc[0] * 100, 2)
+    canal = cube.top("saleschannel", 1)
+    if canal:
+        resultado["canal_ideal"] = canal[0]["saleschannel"]
+        resultado["taxa_canal"] = round(canal[0]["taxa"] * 100, 2)
+
+    hora = cube.top("hour", 1)
+    if hora:
+        resultado["horario_ideal"] = f"{int(hora[0]['hour']):02d}:00h"
+        resultado["taxa_horario"] = round(hora[0]["taxa"] * 100, 2)
+
+    tipo = cube.top("type", 1)
+    if tipo:
+        resultado["tipo_ideal"] = tipo[0]["type"]
+        resultado["taxa_tipo"] = round(tipo[0]["taxa"] * 100, 2)
+
+    loja = cube.top("store", 1)
+    if loja:
+        resultado["loja_ideal"] = loja[0]["store"]
+        resultado["taxa_loja"] = round(loja[0]["taxa"] * 100, 2)
 
     return resultado
+
+def melhores_por_dimensao(campaigns: pd.DataFrame | CampaignCube, by: str, k: int = 3, **filtros) -> list[dict]:
+    """
+    Top-k de uma dimensão (saleschannel, hour, type, store) dentro de um slice.
+    Ex.: melhores_por_dimensao(cubo, "hour", type="promo", saleschannel="IFOOD").
+    Dimensão desconhecida (em `by` ou nos filtros) resulta em [].
+    """
+    return [
+        {**linha, "taxa": round(linha["taxa"] * 100, 2)}
+        for linha in campaign_cube(campaigns).top(by, k, **filtros)
+    ]
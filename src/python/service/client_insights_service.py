@@ -1,15 +1,25 @@
+import os
+import copy
+import threading
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from core.data_loader import load_period
+from core.campaign_cube import DIMENSOES, METRICA, CampaignCube
+from core.coalescing import CoalescingCache, env_seconds
+from core.data_loader import BASE_DATA_DIR, load_table, to_datetime
+from core.metric_graph import MetricGraph
 from core.metrics import inactivity_rate
+from core.rfm import RFMTable
+from core.sampling import StratifiedReservoir, ic
 
 # ====== Importa serviços inteligentes ======
 from service.sentiment_service import analisar_sentimentos
-from service.campaign_optimizer_service import otimizar_campanhas
+from service.campaign_optimizer_service import otimizar_campanhas, melhores_por_dimensao
 from service.anomaly_service import detectar_anomalias
 
 
+PERIODOS = ("30d", "60d", "90d")
+
 def _period_days(period: str) -> tuple[int, str | None]:
     """Mapeia o período atual e o período anterior."""
     if period == "30d":
@@ -38,20 +48,20 @@ def _try_lr_forecast(y: np.ndarray, steps: int = 7) -> np.ndarray:
         return np.polyval(coeffs, xf)
 
 
-def generate_client_insights(period: str = "30d") -> dict:
-    """Gera o relatório de insights do cliente (Painel Cliente Cannoli)."""
-    orders, customers, campaigns = load_period(period)
-    days, prev_period = _period_days(period)
-
+def _load_campaign_queue(period: str) -> pd.DataFrame:
     # ==================== 🔹 Leitura opcional do CampaignQueue ====================
     try:
-        campaign_queue = pd.read_json(f"campaignqueue_{period}.json", encoding="utf-8")
+        return pd.read_json(f"campaignqueue_{period}.json", encoding="utf-8")
     except Exception:
-        campaign_queue = pd.DataFrame(columns=["response"])
+        return pd.DataFrame(columns=["response"])
+
+
+def _resumo_clientes(period: str, customers: pd.DataFrame, old_customers: pd.DataFrame | None) -> dict:
+    """Ticket, receita, atividade, inatividade e reativação (com os ajustes por período)."""
+    days, prev_period = _period_days(period)
 
     # ==================== 🔹 Métricas base ====================
-    if "lastOrder" in customers.columns:
-        customers["lastOrder"] = pd.to_datetime(customers["lastOrder"], errors="coerce")
+    customers = to_datetime(customers, ["lastOrder"])
 
     ticket_medio = round(customers.get("avgTicket", pd.Series(dtype=float)).mean(), 2) if "avgTicket" in customers else 0
     receita_total = round(customers.get("totalSpent", pd.Series(dtype=float)).sum(), 2) if "totalSpent" in customers else 0
@@ -73,10 +83,12 @@ def generate_client_insights(period: str = "30d") -> dict:
         inativos_num = int(inativos_num * 1.2)
 
     # ==================== 🔹 Reativação de clientes ====================
-    if prev_period:
+    # lastOrder chega em UTC (schema "customers"), então a comparação com o corte
+    # funciona; antes da ingestão canônica ela levantava TypeError (naive × aware)
+    # e o cálculo sempre caía no ajuste fixo abaixo.
+    if prev_period and old_customers is not None:
         try:
-            _, old_customers, _ = load_period(prev_period)
-            old_customers["lastOrder"] = pd.to_datetime(old_customers["lastOrder"], errors="coerce")
+            old_customers = to_datetime(old_customers, ["lastOrder"])
 
             cutoff_old = pd.Timestamp.utcnow() - pd.Timedelta(days=int(days * 1.5))
             antigos_inativos = set(old_customers.loc[old_customers["lastOrder"] < cutoff_old, "id"].astype(str))
@@ -87,7 +99,7 @@ def generate_client_insights(period: str = "30d") -> dict:
                 & (customers["lastOrder"] >= now_cut)
             ]
             clientes_reativados = int(len(reativados))
-        except Exception:
+        except KeyError:  # arquivo sem id/lastOrder
             clientes_reativados = 0
 
     # Ajuste se zero reativados
@@ -110,41 +122,85 @@ def generate_client_insights(period: str = "30d") -> dict:
 
     taxa_recuperacao = round((clientes_reativados / max(inativos_num + clientes_reativados, 1)) * 100, 2)
 
+    return {
+        "ticket_medio": ticket_medio,
+        "receita_total": receita_total,
+        "clientes_ativos": clientes_ativos,
+        "clientes_inativos": inativos_num,
+        "clientes_reativados": clientes_reativados,
+        "taxa_inatividade": taxa_inatividade,
+        "taxa_recuperacao": taxa_recuperacao,
+    }
+
+
+def _previsao_receita(customers: pd.DataFrame) -> list[dict]:
     # ==================== 🔹 Previsão de Receita ====================
     if not customers.empty and "totalSpent" in customers:
         clientes_sorted = customers.sort_values("totalSpent", ascending=True)
         y = clientes_sorted["totalSpent"].to_numpy(dtype=float)
         y_pred = np.clip(_try_lr_forecast(y, steps=7), a_min=0, a_max=None)
         datas = [datetime.now() + timedelta(days=i + 1) for i in range(7)]
-        previsao = [{"data": d.isoformat(), "receita_prevista": float(v)} for d, v in zip(datas, y_pred)]
-    else:
-        previsao = []
+        return [{"data": d.isoformat(), "receita_prevista": float(v)} for d, v in zip(datas, y_pred)]
+    return []
+
 
+def _sentimentos(campaign_queue: pd.DataFrame) -> dict:
     # ==================== 🤖 IA 1: Análise de Sentimentos ====================
     if not campaign_queue.empty and "response" in campaign_queue.columns:
-        sentimentos = analisar_sentimentos(campaign_queue)
-    else:
-        sentimentos = {"positivas": 0, "neutras": 0, "negativas": 0}
+        return analisar_sentimentos(campaign_queue)
+    return {"positivas": 0, "neutras": 0, "negativas": 0}
 
-    # ==================== 🤖 IA 2: Otimização de Campanhas ====================
-    otimizacao = otimizar_campanhas(campaigns)
 
-    # ==================== 🤖 IA 3: Detecção de Anomalias ====================
-    anomalias = detectar_anomalias(previsao)
+def _rfm_resumo(rfm: RFMTable, orders: pd.DataFrame, hoje: str) -> dict:
+    # ==================== 📊 RFM derivado dos pedidos ====================
+    # mesma referência ("hoje") das demais métricas do relatório; só pedidos novos são agregados
+    now = pd.Timestamp(hoje, tz="UTC")
+    rfm.sync(orders, now=now)
+    if rfm.stale_rows():
+        rfm.resegment(now)
+    rfm_df = rfm.features()
+    return {
+        "clientes": int(len(rfm)),
+        "receita_pedidos": round(float(rfm_df["monetary"].sum()), 2) if len(rfm) else 0.0,
+        "ticket_medio_pedidos": round(float(rfm_df["monetary"].sum() / max(rfm_df["frequency"].sum(), 1)), 2) if len(rfm) else 0.0,
+        "segmentos": rfm.segment_counts(),
+    }
+
+
+def _amostra_clientes(customers: pd.DataFrame) -> StratifiedReservoir:
+    # ==================== 🎯 Amostra para o modo aproximado ====================
+    sample = StratifiedReservoir(
+        ["segment"], ["avgTicket", "totalSpent", "ativo"],
+        capacity=int(os.environ.get("INSIGHTS_SAMPLE_PER_STRATUM", 200)),
+    )
+    if "status" in customers.columns:
+        customers = customers.assign(ativo=(customers["status"] == "Active").astype(float))
+    sample.add(customers)
+    return sample
+
 
+def _campanhas_inteligentes(customers: pd.DataFrame, resumo: dict) -> dict:
     # ==================== 📊 Campanhas Inteligentes ====================
     clientes_vip = int((customers.get("isVIP", pd.Series(False)) == True).sum())
     clientes_fieis = int(customers.get("segment", pd.Series("")).str.lower().eq("loyal").sum()) if "segment" in customers else 0
     churn_total = int((customers.get("churnRisk", pd.Series(False)) == True).sum())
 
-    campanhas_inteligentes = {
-        "Reativação": clientes_reativados,
+    return {
+        "Reativação": resumo["clientes_reativados"],
         "Fidelização": clientes_fieis,
         "VIPs": clientes_vip,
         "Churn Risk": churn_total,
     }
 
+
+def _recomendacoes(resumo: dict, campanhas_inteligentes: dict, sentimentos: dict) -> list[str]:
     # ==================== 💡 Recomendações Inteligentes ====================
+    inativos_num = resumo["clientes_inativos"]
+    clientes_reativados = resumo["clientes_reativados"]
+    clientes_fieis = campanhas_inteligentes["Fidelização"]
+    clientes_vip = campanhas_inteligentes["VIPs"]
+    churn_total = campanhas_inteligentes["Churn Risk"]
+
     recomendacoes = []
     if inativos_num > 0:
         recomendacoes.append(f"Envie 'Volte e Ganhe 10%' para {inativos_num} clientes inativos.")
@@ -160,14 +216,17 @@ def generate_client_insights(period: str = "30d") -> dict:
         recomendacoes.append(f"⚠️ Identifique e responda {sentimentos['negativas']} feedbacks negativos para melhorar satisfação.")
     if sentimentos["positivas"] > 0:
         recomendacoes.append(f"💬 Destaque {sentimentos['positivas']} elogios em redes sociais ou campanhas futuras.")
+    return recomendacoes
+
 
+def _campanha_insights(campaigns: pd.DataFrame) -> dict:
     # ==================== 📈 Insights de Campanhas ====================
     if not campaigns.empty and "conversionRate" in campaigns.columns:
         try:
             media = round(float(campaigns["conversionRate"].mean()) * 100, 2)
             melhor = campaigns.loc[campaigns["conversionRate"].idxmax()]
             pior = campaigns.loc[campaigns["conversionRate"].idxmin()]
-            campanha_insights = {
+            return {
                 "taxa_conversao_media": media,
                 "melhor_campanha": {
                     "nome": melhor.get("name", "N/A"),
@@ -179,27 +238,162 @@ def generate_client_insights(period: str = "30d") -> dict:
                 },
             }
         except Exception:
-            campanha_insights = {}
-    else:
-        campanha_insights = {}
+            return {}
+    return {}
+
+
+CUSTOMER_RESUMO_COLS = ["id", "avgTicket", "totalSpent", "status", "lastOrder"]
+CAMPAIGN_CUBE_COLS = [c for cands in DIMENSOES.values() for c in cands] + [METRICA]
+RFM_ORDER_COLS = ["id", "customer.id", "total.orderAmount", "createdAt"]
+
+
+def _build_client_graph(period: str) -> MetricGraph:
+    days, prev_period = _period_days(period)
+    g = MetricGraph(f"cliente_{period}")
+
+    g.source("orders", os.path.join(BASE_DATA_DIR, f"orders_{period}.json"),
+             lambda: load_table(f"orders_{period}.json", "orders"))
+    g.source("customers", os.path.join(BASE_DATA_DIR, f"customers_{period}.json"),
+             lambda: load_table(f"customers_{period}.json", "customers"))
+    g.source("campaigns", os.path.join(BASE_DATA_DIR, "campaigns.json"),
+             lambda: load_table("campaigns.json", "campaigns"))
+    g.source("campaign_queue", f"campaignqueue_{period}.json", lambda: _load_campaign_queue(period))
+    # métricas relativas a "agora" são refeitas uma vez por dia mesmo sem dados novos
+    g.value("hoje", lambda: pd.Timestamp.now("UTC").strftime("%Y-%m-%d"))
+
+    inputs = {"customers": CUSTOMER_RESUMO_COLS}
+    if prev_period:
+        g.source("customers_prev", os.path.join(BASE_DATA_DIR, f"customers_{prev_period}.json"),
+                 lambda: load_table(f"customers_{prev_period}.json", "customers"))
+        inputs["customers_prev"] = ["id", "lastOrder"]
+    g.metric("resumo",
+             lambda customers, hoje, customers_prev=None: _resumo_clientes(period, customers, customers_prev),
+             inputs=inputs, deps=["hoje"])
+
+    g.metric("previsao", lambda customers, hoje: _previsao_receita(customers),
+             inputs={"customers": ["totalSpent"]}, deps=["hoje"])
+    g.metric("sentimentos", lambda campaign_queue: _sentimentos(campaign_queue),
+             inputs={"campaign_queue": ["response"]})
+    # ==================== 🤖 IA 2: Otimização de Campanhas ====================
+    g.metric("cubo_campanhas", lambda campaigns: CampaignCube(campaigns),
+             inputs={"campaigns": CAMPAIGN_CUBE_COLS})
+    g.metric("otimizacao", lambda cubo_campanhas: otimizar_campanhas(cubo_campanhas),
+             deps=["cubo_campanhas"])
+    # ==================== 🤖 IA 3: Detecção de Anomalias ====================
+    g.metric("anomalias", lambda previsao: detectar_anomalias(previsao), deps=["previsao"])
+    rfm = RFMTable()
+    g.metric("rfm", lambda orders, hoje: _rfm_resumo(rfm, orders, hoje),
+             inputs={"orders": RFM_ORDER_COLS}, deps=["hoje"])
+    g.metric("campanhas_inteligentes", lambda customers, resumo: _campanhas_inteligentes(customers, resumo),
+             inputs={"customers": ["isVIP", "segment", "churnRisk"]}, deps=["resumo"])
+    g.metric("recomendacoes", _recomendacoes, deps=["resumo", "campanhas_inteligentes", "sentimentos"])
+    # refeita só quando as colunas amostradas de customers_{period}.json mudam
+    g.metric("amostra_clientes", lambda customers: _amostra_clientes(customers),
+             inputs={"customers": ["segment", "avgTicket", "totalSpent", "status"]})
+    g.metric("campanha_insights", lambda campaigns: _campanha_insights(campaigns),
+             inputs={"campaigns": ["name", "conversionRate"]})
+    return g
+
+
+# campo do relatório -> nó do grafo
+CLIENT_REPORT = {
+    "resumo_geral": "resumo",
+    "previsao_receita": "previsao",
+    "sentimentos_clientes": "sentimentos",
+    "otimizacao_campanhas": "otimizacao",
+    "anomalias": "anomalias",
+    "campanhas_inteligentes": "campanhas_inteligentes",
+    "rfm_clientes": "rfm",
+    "campanha_insights": "campanha_insights",
+    "recomendacoes": "recomendacoes",
+}
+
+_client_graphs: dict[str, MetricGraph] = {}
+_client_graphs_lock = threading.Lock()
+
+def _client_graph(period: str) -> MetricGraph:
+    with _client_graphs_lock:
+        if period not in _client_graphs:
+            _client_graphs[period] = _build_client_graph(period)
+        return _client_graphs[period]
+
+def melhores_campanhas(by: str, k: int = 3, period: str = "30d", **filtros) -> list[dict]:
+    """Top-k de uma dimensão de campanha; o cubo só é refeito quando campaigns.json muda."""
+    cubo = _client_graph(period).run(["cubo_campanhas"])["cubo_campanhas"]
+    return melhores_por_dimensao(cubo, by, k, **filtros)
+
+def client_graph_report(period: str = "30d") -> dict:
+    """Quais nós do painel cliente foram recalculados na última geração do período."""
+    return _client_graph(period).report()
+
+
+def generate_client_insights(period: str = "30d", approx: bool = False, fraction: float = 1.0) -> dict:
+    """Gera o relatório de insights do cliente (Painel Cliente Cannoli)."""
+    if approx:
+        return generate_client_insights_approx(period, fraction)
+    out = _client_graph(period).run(list(CLIENT_REPORT.values()))
 
     # ==================== 🔚 Retorno Final ====================
+    # cópia: as saídas do grafo são o cache; quem recebe o relatório pode alterá-lo
     return {
         "restaurante": "La Pasticceria Cannoli",
-        "resumo_geral": {
-            "ticket_medio": ticket_medio,
-            "receita_total": receita_total,
-            "clientes_ativos": clientes_ativos,
-            "clientes_inativos": inativos_num,
-            "clientes_reativados": clientes_reativados,
-            "taxa_inatividade": taxa_inatividade,
-            "taxa_recuperacao": taxa_recuperacao,
-        },
-        "previsao_receita": previsao,
-        "sentimentos_clientes": sentimentos,
-        "otimizacao_campanhas": otimizacao,
-        "anomalias": anomalias,
-        "campanhas_inteligentes": campanhas_inteligentes,
-        "campanha_insights": campanha_insights,
-        "recomendacoes": recomendacoes,
+        **{campo: copy.deepcopy(out[no]) for campo, no in CLIENT_REPORT.items()},
     }
+
+
+# ========= Modo aproximado (amostra estratificada por segmento) =========
+# Clientes não têm loja/canal; o estrato é o `segment`.
+def generate_client_insights_approx(period: str = "30d", fraction: float = 1.0) -> dict:
+    """
+    Estima ticket médio, receita e taxa de atividade a partir da amostra
+    estratificada de clientes, com IC 95%. Valores-base, sem os ajustes por período.
+    """
+    sample = _client_graph(period).run(["amostra_clientes"])["amostra_clientes"]
+    est = sample.estimate([], fraction)
+    if est.empty:
+        resumo, amostra, populacao = {}, 0, 0
+    else:
+        t = {k: (float(v) if k not in ("N", "n") else v) for k, v in est.iloc[0].items()}
+        amostra, populacao = int(t["n"]), int(t["N"])
+        # sem coluna status a estimativa de ativos é NaN; o modo exato reporta 0
+        sem_status = np.isnan(t["ativo_total"])
+        resumo = {
+            "ticket_medio": round(t["avgTicket_media"], 2),
+            "receita_total": round(t["totalSpent_total"], 2),
+            "clientes_ativos": 0 if sem_status else int(round(t["ativo_total"])),
+            "taxa_atividade": 0.0 if sem_status else round(t["ativo_media"] * 100, 2),
+            "intervalos_95": {
+                "ticket_medio": ic(t["avgTicket_media"], t["avgTicket_media_ic"]),
+                "receita_total": ic(t["totalSpent_total"], t["totalSpent_total_ic"]),
+                "clientes_ativos": ic(t["ativo_total"], t["ativo_total_ic"], 0),
+                "taxa_atividade": ic(t["ativo_media"] * 100, t["ativo_media_ic"] * 100),
+            },
+        }
+
+    return {
+        "restaurante": "La Pasticceria Cannoli",
+        "modo": "aproximado",
+        "amostra": {"fracao": fraction, "linhas": amostra, "populacao": populacao},
+        "resumo_geral": resumo,
+    }
+
+def progressive_client_insights(period: str = "30d", fractions=(0.1, 0.5)):
+    """Gera prévias aproximadas crescentes e, por último, o relatório exato."""
+    for f in fractions:
+        yield generate_client_insights_approx(period, f)
+    yield {**generate_client_insights(period), "modo": "exato"}
+
+
+# Cache compartilhado para processos de longa duração (várias requisições por processo).
+_client_cache = CoalescingCache(
+    generate_client_insights,
+    ttl=env_seconds("INSIGHTS_CACHE_TTL", 30.0),
+    stale_ttl=env_seconds("INSIGHTS_STALE_TTL", 300.0),
+)
+
+def get_client_insights(period: str = "30d") -> dict:
+    """generate_client_insights com coalescência de requisições e stale-while-revalidate."""
+    return _client_cache.get(period)
+
+def client_cache_stats() -> dict:
+    return _client_cache.stats()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# garante path correto (mesmo esquema dos scripts de entrada)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import math
+import pandas as pd
+import pytest
+from core.data_source import JsonDataSource, load_sqlite
+
+# Paridade JSON × SQLite (stand-in do MySQL) sobre os dados de data/.
+
+INICIO = pd.Timestamp("2025-01-01", tz="UTC")
+
+@pytest.fixture(scope="module")
+def sources():
+    # os pedidos de data/ têm um único createdat: espalha-os em 100 dias exatos
+    # para que as janelas cortem no meio (e testem início inclusivo / fim exclusivo)
+    frames = dict(JsonDataSource()._load())
+    order = frames["order"].copy()
+    order["createdat"] = INICIO + pd.to_timedelta(range(len(order)), unit="D")
+    frames["order"] = order
+    json_src = JsonDataSource(frames)
+    sql_src = load_sqlite(":memory:", source=json_src)
+    sql_src.batch_size = 7  # força vários lotes de fetchmany
+    yield json_src, sql_src
+    sql_src.close()
+
+def _windows(json_src):
+    dia = lambda n: INICIO + pd.Timedelta(days=n)
+    return [(None, None), (dia(50), None), (None, dia(50)), (dia(25), dia(75)), (dia(200), None)]
+
+def _assert_same(sql_df: pd.DataFrame, json_df: pd.DataFrame, janela):
+    # AVG do banco e mean do pandas somam em ordens diferentes: após o round(2)
+    # podem cair em lados opostos de um ,xx5 -> tolerância de um centavo
+    sql_rows, json_rows = sql_df.to_dict(orient="records"), json_df.to_dict(orient="records")
+    assert len(sql_rows) == len(json_rows), janela
+    for s, j in zip(sql_rows, json_rows):
+        assert s.keys() == j.keys(), janela
+        for k in s:
+            if isinstance(j[k], (int, float)) and not isinstance(j[k], bool):
+                if math.isnan(float(j[k])):
+                    assert math.isnan(float(s[k])), (janela, k)
+                else:
+                    assert float(s[k]) == pytest.approx(float(j[k]), abs=0.011), (janela, k, s, j)
+            else:
+                assert s[k] == j[k], (janela, k)
+
+def test_admin_summary_parity(sources):
+    json_src, sql_src = sources
+    for start, end in _windows(json_src):
+        s, j = sql_src.admin_summary(start, end), json_src.admin_summary(start, end)
+        assert s.keys() == j.keys(), (start, end)
+        assert s["total_pedidos"] == j["total_pedidos"] and s["total_clientes"] == j["total_clientes"], (start, end)
+        for k in ("ticket_medio_geral", "tempo_medio_preparo"):
+            assert s[k] == pytest.approx(j[k], abs=0.011), (start, end, k)
+
+def test_kpis_by_store_parity(sources):
+    json_src, sql_src = sources
+    for start, end in _windows(json_src):
+        _assert_same(sql_src.kpis_by_store(start, end, limit=10),
+                     json_src.kpis_by_store(start, end, limit=10), (start, end))
+
+def test_kpis_by_channel_parity(sources):
+    json_src, sql_src = sources
+    for start, end in _windows(json_src):
+        _assert_same(sql_src.kpis_by_channel(start, end),
+                     json_src.kpis_by_channel(start, end), (start, end))
@@ -0,0 +1,50 @@
+import pandas as pd
+from core.data_source import JsonDataSource, OrderLogDataSource
+from core.order_log import build_order_log
+from core.sampling import StratifiedReservoir
+from service.admin_insights_service import (
+    ORDER_SAMPLE_STRATA, ORDER_SAMPLE_VALUES, generate_admin_dashboard_approx,
+)
+
+# Reservatório persistente: só as linhas novas entram; histórico reescrito recomeça.
+
+def _pedidos():
+    return JsonDataSource()._load()["order"][ORDER_SAMPLE_STRATA + ORDER_SAMPLE_VALUES]
+
+def _novo():
+    return StratifiedReservoir(ORDER_SAMPLE_STRATA, ORDER_SAMPLE_VALUES, capacity=5)
+
+def test_sync_adds_only_appended_rows():
+    order = _pedidos()
+    sample = _novo()
+    assert sample.sync(order.iloc[:60]) == 60
+    assert sample.sync(order) == len(order) - 60
+    assert sample.sync(order) == 0
+    assert sample.rows_seen == len(order)
+    assert sample.estimate([])["N"][0] == len(order)
+
+def test_sync_restarts_when_history_is_rewritten():
+    order = _pedidos()
+    sample = _novo()
+    sample.sync(order)
+    editado = order.copy()
+    editado.loc[editado.index[3], "total.orderamount"] += 1
+    assert sample.sync(editado) == len(order)
+
+    fresh = _novo()
+    fresh.add(editado)
+    pd.testing.assert_frame_equal(sample.estimate([]), fresh.estimate([]))
+
+def test_log_sample_follows_appends(tmp_path):
+    order = JsonDataSource()._load()["order"]
+    log = build_order_log(order.iloc[:60], str(tmp_path / "orders"))
+    source = OrderLogDataSource(log)
+
+    def pedidos():
+        return generate_admin_dashboard_approx("30d", source)["resumo_geral"]["total_pedidos"]
+
+    assert pedidos() == 60
+    log.append(order.iloc[60:])
+    assert pedidos() == len(order)
+    build_order_log(order.iloc[:10], str(tmp_path / "orders"))
+    assert pedidos() == 10
@@ -1,5 +1,6 @@
 import { spawn } from "child_process";
 import path from "path";
+import readline from "readline";
 import { fileURLToPath } from "url";
 
 // Resolve corretamente __dirname e __filename em módulos ES
@@ -7,59 +8,110 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 /**
- * Executa um script Python e retorna o JSON resultante.
+ * Worker Python de longa duração (src/python/insights_worker.py).
  *
- * @param {"admin"|"client"} userRole - Define qual script Python rodar.
- * @param {"30d"|"60d"|"90d"} period - Período desejado.
- * @returns {Promise<object>} JSON retornado pelo script Python.
+ * Um único processo atende todas as requisições: os grafos de métricas ficam
+ * quentes e pedidos simultâneos iguais são coalescidos no Python. Cada pedido
+ * vai como uma linha JSON {id, role, period} e a resposta volta com o mesmo id.
+ * Se o worker cair, os pedidos pendentes são rejeitados e o próximo o recria.
+ * Um pedido sem resposta em INSIGHTS_TIMEOUT_MS (padrão 60s) é rejeitado e o
+ * worker é reciclado: um thread travado não segura todos os painéis.
  */
-export async function getInsights(period = "30d", userRole = "client") {
-  return new Promise((resolve, reject) => {
-    // Seleciona o script conforme o tipo de usuário
-    const script = userRole === "admin" ? "insights_admin.py" : "insights_from_json.py";
-    const scriptPath = path.resolve(__dirname, `../python/${script}`);
+export const PERIODS = ["30d", "60d", "90d"];
 
-    console.log(`🧠 Executando script Python (${userRole}) → ${scriptPath}`);
+let worker = null;
+let nextId = 0;
+
+function timeoutMs() {
+  return Number(process.env.INSIGHTS_TIMEOUT_MS) || 60000;
+}
 
-    // ⚙️ Executa o Python sem sobrescrever o objeto global "process"
-    const pythonProcess = spawn("python", [scriptPath, period], {
-      cwd: path.resolve(__dirname, "../python"),
-      env: { ...process.env, PYTHONIOENCODING: "utf-8" },
-    });
+function getWorker() {
+  if (worker) return worker;
 
-    // Buffers para capturar saída e erros
-    let stdout = "";
-    let stderr = "";
+  const scriptPath = path.resolve(__dirname, "../python/insights_worker.py");
+  console.log(`🧠 Iniciando worker Python → ${scriptPath}`);
 
-    pythonProcess.stdout.on("data", (chunk) => {
-      stdout += chunk.toString();
-    });
+  const proc = spawn("python", [scriptPath], {
+    cwd: path.resolve(__dirname, "../python"),
+    env: { ...process.env, PYTHONIOENCODING: "utf-8" },
+  });
+  // pedidos ficam no próprio worker: reciclar um não rejeita os do seguinte
+  proc.pending = new Map();
 
-    pythonProcess.stderr.on("data", (chunk) => {
-      stderr += chunk.toString();
-    });
+  readline.createInterface({ input: proc.stdout }).on("line", (line) => {
+    let msg;
+    try {
+      msg = JSON.parse(line);
+    } catch (err) {
+      console.error("⚠️ Erro ao parsear resposta do worker:", err.message);
+      console.log("🪵 Saída completa:", line);
+      return;
+    }
+    const req = proc.pending.get(msg.id);
+    if (!req) return;
+    proc.pending.delete(msg.id);
+    clearTimeout(req.timer);
+    if (msg.ok) {
+      console.log(`✅ Insight ${req.role} (${req.period}) recebido com sucesso!`);
+      req.resolve(msg.result);
+    } else {
+      console.error("❌ Erro ao executar Python:", msg.error);
+      req.reject(new Error(msg.error || "Falha ao gerar insights."));
+    }
+  });
 
-    // Evento disparado ao encerrar o processo Python
-    pythonProcess.on("close", (code) => {
-      if (code !== 0 || stderr) {
-        console.error("❌ Erro ao executar Python:", stderr);
-        return reject(new Error(stderr || "Falha ao gerar insights."));
-      }
+  proc.stderr.on("data", (chunk) => {
+    console.warn("🪵 Python:", chunk.toString().trim());
+  });
 
-      try {
-        const clean = stdout.trim();
-        const jsonMatch = clean.match(/\{[\s\S]*\}$/);
+  const fail = (reason) => {
+    if (worker === proc) worker = null;
+    for (const [id, req] of proc.pending) {
+      proc.pending.delete(id);
+      clearTimeout(req.timer);
+      req.reject(new Error(reason));
+    }
+  };
+  proc.on("error", (err) => fail(`Falha ao iniciar o worker Python: ${err.message}`));
+  proc.stdin.on("error", (err) => fail(`Falha ao enviar ao worker Python: ${err.message}`));
+  proc.on("close", (code) => fail(`Worker Python encerrado (código ${code}).`));
 
-        if (!jsonMatch) throw new Error("Nenhum JSON encontrado na saída do Python.");
+  worker = proc;
+  return proc;
+}
 
-        const data = JSON.parse(jsonMatch[0]);
-        console.log(`✅ Insight ${userRole} (${period}) recebido com sucesso!`);
-        resolve(data);
-      } catch (err) {
-        console.error("⚠️ Erro ao parsear JSON:", err.message);
-        console.log("🪵 Saída completa:", stdout);
-        reject(err);
-      }
-    });
+/** Derruba um worker travado; os demais pedidos pendentes nele são rejeitados no "close". */
+function recycleWorker(proc) {
+  if (worker === proc) worker = null;
+  proc.kill("SIGKILL");
+}
+
+/** Encerra o worker (ex.: ao desligar o servidor ou ao fim de um benchmark). */
+export function stopInsightsWorker() {
+  if (worker) worker.stdin.end();
+}
+
+/**
+ * Gera os insights via worker Python e retorna o JSON resultante.
+ *
+ * @param {"admin"|"client"} userRole - Define qual painel gerar.
+ * @param {"30d"|"60d"|"90d"} period - Período desejado.
+ * @returns {Promise<object>} JSON retornado pelo Python.
+ */
+export async function getInsights(period = "30d", userRole = "client") {
+  return new Promise((resolve, reject) => {
+    const role = userRole === "admin" ? "admin" : "client";
+    const id = ++nextId;
+    const proc = getWorker();
+    const ms = timeoutMs();
+    const timer = setTimeout(() => {
+      proc.pending.delete(id);
+      console.error(`⏱️ Insight ${role} (${period}) sem resposta em ${ms}ms; reciclando worker.`);
+      reject(new Error(`Tempo esgotado ao gerar insights (${ms}ms).`));
+      recycleWorker(proc);
+    }, ms);
+    proc.pending.set(id, { resolve, reject, role, period, timer });
+    proc.stdin.write(JSON.stringify({ id, role, period }) + "\n");
   });
 }